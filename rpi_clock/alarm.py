@@ -1,35 +1,115 @@
 import asyncio
+import heapq
 import json
-from datetime import datetime, time, timedelta
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from itertools import count
 from pathlib import Path
-from typing import Callable, Optional, Union, cast
+from time import monotonic
+from typing import Callable, Iterator, Optional, Union, cast
 
+from fastapi import HTTPException
 from structlog import get_logger
 
 from . import run
 from .endpoint import Endpoint
 from .reactive import Watched
+from .recurrence import Recurrence
+from .scheduler import Scheduler, scheduler
+from .store import SettingsStore, shared_store
 
 logger = get_logger()
 
 
+@dataclass
+class ElapseRecord:
+    """When an alarm went off, against when it was due, and how ringing went.
+
+    `stages` maps each timed stage of ringing and ending the alarm to its duration
+    in seconds.
+    """
+
+    scheduled: datetime
+    elapsed: datetime
+    late_s: float
+    stages: dict[str, float] = field(default_factory=dict)
+    ended: Optional[datetime] = None
+
+    def to_json(self) -> dict:
+        """Get a json-serialisable representation."""
+        return {
+            "scheduled": self.scheduled.isoformat(),
+            "elapsed": self.elapsed.isoformat(),
+            "late_s": self.late_s,
+            "stages": dict(self.stages),
+            "ended": self.ended.isoformat() if self.ended else None,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "ElapseRecord":
+        """Load from the output of `to_json()`."""
+        ended = data.get("ended")
+        return cls(
+            scheduled=datetime.fromisoformat(data["scheduled"]),
+            elapsed=datetime.fromisoformat(data["elapsed"]),
+            late_s=data["late_s"],
+            stages=data.get("stages", {}),
+            ended=datetime.fromisoformat(ended) if ended else None,
+        )
+
+
+_elapse: ContextVar[Optional[ElapseRecord]] = ContextVar("elapse", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of ringing (or ending) the current alarm, if any."""
+    start = monotonic()
+    try:
+        yield
+    finally:
+        if record := _elapse.get():
+            record.stages[name] = round(monotonic() - start, 3)
+
+
 class Alarm:
     """An alarm."""
 
     OFF = "OFF"
     WAITING = "WAITING"
     IN_PROGRESS = "IN PROGRESS"
+    PREPARE_LEAD_S = 120
+    HISTORY = 32
     instances = 0
-    TICK_S = 10
 
     def __init__(
         self,
         *,
         callback: Callable,
         cancel_callback: Optional[Callable] = None,
+        prepare_callback: Optional[Callable] = None,
+        prepare_lead_s: Optional[float] = None,
         name: Optional[str] = None,
+        recurrence: Optional[Recurrence] = None,
+        scheduler: Scheduler = scheduler,
     ) -> None:
-        """Set up the alarm."""
+        """Set up the alarm.  By default it repeats every day.
+
+        If given, `prepare_callback` is run `prepare_lead_s` before each elapse, to
+        get anything slow out of the way before `callback` needs it.
+        """
+        self.scheduler = scheduler
+        self.prepare_callback = prepare_callback
+        self.prepare_lead_s = (
+            self.PREPARE_LEAD_S if prepare_lead_s is None else prepare_lead_s
+        )
+        self._prepare_task: Optional[asyncio.Task] = None
+        self.history: deque[ElapseRecord] = deque(maxlen=self.HISTORY)
+        self._recurrence = recurrence or Recurrence()
+        self.index: Optional["Alarms"] = None
         self.callback = callback
         self.cancel_callback = cancel_callback
         self._saved_target: Optional[time] = None
@@ -68,6 +148,17 @@ class Alarm:
         self._target = val
         self._start_waiting()
 
+    @property
+    def recurrence(self) -> Recurrence:
+        """Get when the alarm repeats."""
+        return self._recurrence
+
+    @recurrence.setter
+    def recurrence(self, val: Recurrence):
+        """Set when the alarm repeats, rescheduling it."""
+        self._recurrence = val
+        self.reschedule()
+
     @property
     def next_elapse(self) -> Optional[datetime]:
         """Get next elapse point."""
@@ -75,6 +166,23 @@ class Alarm:
             return None
         return self._next_elapse.value
 
+    def upcoming(self, after: Optional[datetime] = None) -> Optional[datetime]:
+        """Get the first elapse of the current target after `after` (default now)."""
+        if not isinstance(self._target, time):
+            return None
+        after = after or datetime.now()
+        # A snooze is a one-off, whatever days the alarm normally repeats on.
+        recurrence = Recurrence() if self._snoozing else self._recurrence
+        return recurrence.next_elapse(self._target, after)
+
+    def skip_next(self) -> Optional[datetime]:
+        """Skip the next elapse, returning the one after it."""
+        if not (elapse := self.next_elapse):
+            return None
+        self._recurrence.skip = elapse.date()
+        self.reschedule()
+        return self.upcoming()
+
     @property
     def enabled(self):
         """Get current enabled state."""
@@ -105,35 +213,57 @@ class Alarm:
             return True
 
     def _stop_waiting(self):
+        if self._prepare_task:
+            self._prepare_task.cancel()
+            self._prepare_task = None
+
         async def _cancel(waiter):
             await asyncio.sleep(1)
             waiter.cancel()
 
         if self._waiter:
-            self.cancel()
-            if asyncio.get_event_loop().is_running():
+            if self.cancel() and asyncio.get_event_loop().is_running():
                 # run in asyncio thread to allow cleanup
                 asyncio.create_task(_cancel(self._waiter))
             else:
+                # Not ringing, so nothing to clean up; don't let it elapse.
                 self._waiter.cancel()
         self._state = self.OFF
+        self._update_index()
 
     def _start_waiting(self):
+        if self._recurrence.skip and self._recurrence.skip < date.today():
+            # The skipped elapse is over.
+            self._recurrence.skip = None
         if self._enabled:
             self._waiter = asyncio.get_event_loop().create_task(self._schedule())
 
+    def reschedule(self):
+        """Recompute the next elapse, e.g. after changing the recurrence in place."""
+        self._stop_waiting()
+        self._start_waiting()
+
+    def close(self):
+        """Stop the alarm for good."""
+        self.index = None
+        self.enabled = False
+
+    def _update_index(self):
+        if self.index:
+            self.index.update(self)
+
     def snooze(self, duration: timedelta):
         """Snooze for a given duration."""
         if not self._snoozing:
             self._saved_target = self.target
             self._saved_oneshot = self.oneshot
         self.oneshot = True
+        self._snoozing = True
         if duration:
             self.target = (datetime.now() + duration).time()
         else:
             self.target = True
         self._waiter.add_done_callback(self._restore_target)
-        self._snoozing = True
         self.cancel()
 
     def trigger(self):
@@ -144,84 +274,318 @@ class Alarm:
         if task.cancelled():
             return
         self.oneshot = self._saved_oneshot
-        self.target = self._saved_target
         self._snoozing = False
+        self.target = self._saved_target
+
+    async def _ring(self):
+        with stage("callback"):
+            await run(self.callback)
+
+    def _record(self, record: ElapseRecord):
+        """Add or update `record` in the history."""
+        if not self.history or self.history[-1] is not record:
+            self.history.append(record)
+
+    async def _prepare(self):
+        self._logger.info("Preparing.")
+        try:
+            await run(self.prepare_callback)
+        except Exception:
+            self._logger.exception("Failed to prepare")
 
     async def _schedule(self):
         target_time = self._target
         if not target_time:
             self._state = self.OFF
+            self._update_index()
             return
 
         self._state = self.WAITING
+        scheduled = datetime.now()
         if target_time is not True:
-            now = datetime.now()
-            target = datetime.combine(now.date(), target_time)
-            if target < now:
-                tomorrow = now + timedelta(days=1)
-                target = datetime.combine(tomorrow.date(), target_time)
+            target = self.upcoming()
+            if not target:
+                self._logger.info("No further elapses.")
+                self._state = self.OFF
+                self._update_index()
+                return
             self._next_elapse.value = target
+            self._update_index()
             target = self.adjust_alarm(target)
-            while datetime.now() < target:
-                await asyncio.sleep(self.TICK_S)
+            if self.prepare_callback:
+                lead = timedelta(seconds=self.prepare_lead_s)
+                await self.scheduler.sleep_until(target - lead)
+                self._prepare_task = asyncio.create_task(self._prepare())
+            scheduled = target
+            await self.scheduler.sleep_until(target)
         self._state = self.IN_PROGRESS
-        self._logger.info(f"{self.name} elapsed.")
+        now = datetime.now()
+        record = ElapseRecord(
+            scheduled=scheduled,
+            elapsed=now,
+            late_s=round(max(0.0, (now - scheduled).total_seconds()), 3),
+        )
+        self._logger.info(f"{self.name} elapsed, {record.late_s}s late.")
+        self._record(record)
+        # Stages timed in the callbacks (and any tasks they start) land in record.
+        token = _elapse.set(record)
         self._logger.debug("creating task")
-        ring_task = asyncio.create_task(run(self.callback))
+        ring_task = asyncio.create_task(self._ring())
         self._logger.debug("waiting for event")
         await self._cancel_event.wait()
         self._logger.info("alarm over; cancelling")
         self._cancel_event.clear()
         ring_task.cancel()
+        try:
+            await ring_task
+        except asyncio.CancelledError:
+            pass
         if self.cancel_callback:
-            await run(self.cancel_callback)
+            with stage("cancel_callback"):
+                await run(self.cancel_callback)
+        record.ended = datetime.now()
+        self._record(record)
+        _elapse.reset(token)
         if self.oneshot:
             self._state = self.OFF
+            self._update_index()
         else:
-            self._waiter = asyncio.create_task(self._schedule())
+            self._start_waiting()
 
 
 class CachingAlarm(Alarm):
-    """An alarm which remembers its setpoints."""
+    """An alarm which remembers its settings.
+
+    Its target, recurrence, enabled and oneshot flags and any snooze in progress are
+    saved to a settings store whenever it is rescheduled, and restored on creation.
+    """
+
+    SECTION = "alarms"
+    HISTORY_SECTION = "alarm-history"
 
-    def __init__(self, *args, dbfile: Path, **kwargs):
-        """Initialise a new CachingAlarm."""
-        self.dbfile = dbfile
+    def __init__(
+        self,
+        *args,
+        cache_dir: Optional[Path] = None,
+        store: Optional[SettingsStore] = None,
+        dbfile: Optional[Path] = None,
+        **kwargs,
+    ):
+        """Initialise a new CachingAlarm.
+
+        `dbfile` is the old single-alarm file, imported into the store if present.
+        """
+        self.store = store or shared_store(cache_dir)
+        self._persist = False
         super().__init__(*args, **kwargs)
-        if target := self._load():
-            self.target = target
+        saved = self.store.get(self.SECTION, self.name)
+        if saved is None and dbfile:
+            saved = self._migrate(dbfile)
+        if saved:
+            self._restore(saved)
+        for record in self.store.get(self.HISTORY_SECTION, self.name, []):
+            try:
+                self.history.append(ElapseRecord.from_json(record))
+            except Exception:
+                self._logger.exception("Failed to load alarm history")
+        self._persist = True
+        self._save()
 
-    def _load(self):
+    def _migrate(self, dbfile: Path) -> Optional[dict]:
+        """Import the target from the old alarm file, if any."""
         try:
-            with self.dbfile.open() as f:
-                data = json.load(f)
-                return time.fromisoformat(data["value"])
+            with dbfile.open() as f:
+                target = json.load(f)["value"]
+        except FileNotFoundError:
+            return None
         except Exception:
+            self._logger.exception("Failed to load old alarm file")
             return None
+        self.store.set(self.SECTION, self.name, {"target": target})
+        self.store.flush()
+        dbfile.unlink()
+        return self.store.get(self.SECTION, self.name)
+
+    def _restore(self, saved: dict):
+        try:
+            self._recurrence = Recurrence.from_json(saved.get("recurrence", {}))
+            self.oneshot = saved.get("oneshot", False)
+            self._enabled = saved.get("enabled", True)
+            if target := saved.get("target"):
+                self.target = time.fromisoformat(target)
+            if snooze := saved.get("snooze"):
+                remaining = datetime.fromisoformat(snooze) - datetime.now()
+                if remaining > timedelta(0):
+                    self.snooze(remaining)
+        except Exception:
+            self._logger.exception("Failed to restore alarm")
 
     def _save(self):
-        with self.dbfile.open("w") as f:
-            json.dump({"value": str(self.target)}, f)
+        if not self._persist:
+            return
+        snoozing = self._snoozing
+        target = self._saved_target if snoozing else self._target
+        snooze = self.upcoming() if snoozing else None
+        state = {
+            "target": str(target) if isinstance(target, time) else None,
+            "enabled": self._enabled,
+            "oneshot": self._saved_oneshot if snoozing else self.oneshot,
+            "recurrence": self._recurrence.to_json(),
+            "snooze": snooze.isoformat() if snooze else None,
+        }
+        self.store.set(self.SECTION, self.name, state)
+
+    def _record(self, record: ElapseRecord):
+        super()._record(record)
+        if self._persist:
+            history = [x.to_json() for x in self.history]
+            self.store.set(self.HISTORY_SECTION, self.name, history)
 
-    @property
-    def target(self):
-        """Get alarm target."""
-        return super().target
+    def _stop_waiting(self):
+        super()._stop_waiting()
+        self._save()
 
-    @target.setter
-    def target(self, val):
-        """Set alarm target and save."""
-        super(CachingAlarm, self.__class__).target.fset(self, val)
+    def _start_waiting(self):
+        super()._start_waiting()
         self._save()
 
+    def close(self):
+        """Stop the alarm for good, forgetting its settings."""
+        super().close()
+        self._persist = False
+        self.store.remove(self.SECTION, self.name)
+        self.store.remove(self.HISTORY_SECTION, self.name)
+
+
+class Alarms:
+    """A collection of named alarms, indexed by next elapse.
+
+    Alarms report whenever their next elapse changes, and it is pushed onto a
+    min-heap.  Entries which have gone stale are dropped lazily once they reach the
+    top, so finding the next elapse across every alarm never re-evaluates any
+    recurrence.
+    """
+
+    COMPACT_FACTOR = 4
+
+    def __init__(self, factory: Callable[[str], Alarm]):
+        """Initialise a new collection, creating new alarms with `factory(name)`."""
+        self.factory = factory
+        self._alarms: dict[str, Alarm] = {}
+        self._heap: list[tuple[datetime, int, Alarm]] = []
+        self._seq = count()
+        self._next_elapse: Watched[Optional[datetime]] = Watched()
+
+    def __getitem__(self, name: str) -> Alarm:
+        return self._alarms[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._alarms
+
+    def __iter__(self) -> Iterator[Alarm]:
+        return iter(self._alarms.values())
+
+    def __len__(self) -> int:
+        return len(self._alarms)
+
+    def add(self, alarm: Alarm) -> Alarm:
+        """Add an existing alarm, by its name."""
+        if alarm.name in self._alarms:
+            raise ValueError(f"Alarm {alarm.name} already exists.")
+        self._alarms[alarm.name] = alarm
+        alarm.index = self
+        self.update(alarm)
+        return alarm
+
+    def new(self, name: str) -> Alarm:
+        """Create and add a new alarm."""
+        if name in self._alarms:
+            raise ValueError(f"Alarm {name} already exists.")
+        return self.add(self.factory(name))
+
+    def remove(self, name: str) -> Alarm:
+        """Disable and remove an alarm."""
+        alarm = self._alarms.pop(name)
+        alarm.close()
+        self._publish()
+        return alarm
+
+    def cancel(self) -> bool:
+        """Cancel every alarm in progress."""
+        return any([alarm.cancel() for alarm in self])
+
+    def update(self, alarm: Alarm):
+        """Note that `alarm`'s next elapse may have changed."""
+        elapse = alarm.next_elapse
+        if elapse is not None and self._valid(alarm, elapse):
+            heapq.heappush(self._heap, (elapse, next(self._seq), alarm))
+        if len(self._heap) > self.COMPACT_FACTOR * len(self._alarms):
+            self._heap = [x for x in self._heap if self._valid(x[2], x[0])]
+            heapq.heapify(self._heap)
+        self._publish()
+
+    def _valid(self, alarm: Alarm, elapse: Optional[datetime]) -> bool:
+        return (
+            elapse is not None
+            and self._alarms.get(alarm.name) is alarm
+            and alarm.state == alarm.WAITING
+            and alarm.next_elapse == elapse
+        )
+
+    def _publish(self):
+        elapse = self.next_elapse
+        if elapse != self._next_elapse.value:
+            self._next_elapse.value = elapse
+
+    @property
+    def next(self) -> Optional[Alarm]:
+        """Get the alarm which elapses next."""
+        while self._heap:
+            elapse, _, alarm = self._heap[0]
+            if self._valid(alarm, elapse):
+                return alarm
+            heapq.heappop(self._heap)
+        return None
+
+    @property
+    def next_elapse(self) -> Optional[datetime]:
+        """Get the next elapse of any alarm."""
+        return alarm.next_elapse if (alarm := self.next) else None
+
+
+def describe(alarm: Alarm) -> dict:
+    """Describe an alarm for the api."""
+    return {
+        "name": alarm.name,
+        "target": alarm.target,
+        "enabled": alarm.enabled,
+        "state": alarm.state,
+        "next_elapse": alarm.next_elapse,
+        "rrule": alarm.recurrence.to_rrule(),
+        "dates": sorted(alarm.recurrence.dates),
+        "skip": alarm.recurrence.skip,
+    }
+
 
 class AlarmEndpoint(Endpoint[Alarm]):
-    """An endpoint to control an alarm."""
+    """An endpoint to control an alarm, and optionally a collection of alarms."""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, alarms: Optional[Alarms] = None, **kwargs):
         """Initialise a new alarm endpoint."""
         super().__init__(*args, **kwargs)
+        self.alarms = alarms
         self.router.get("/next-elapse")(self.next_elapse)
+        if alarms is not None:
+            self.router.get("/alarms")(self.list_alarms)
+            self.router.get("/alarms/{name}")(self.get_alarm)
+            self.router.put("/alarms/{name}")(self.set_alarm)
+            self.router.delete("/alarms/{name}")(self.remove_alarm)
+            self.router.put("/alarms/{name}/enabled")(self.set_alarm_enabled)
+            self.router.put("/alarms/{name}/dates")(self.add_alarm_date)
+            self.router.delete("/alarms/{name}/dates")(self.remove_alarm_date)
+            self.router.put("/alarms/{name}/skip")(self.skip_alarm)
+            self.router.delete("/alarms/{name}/skip")(self.unskip_alarm)
+            self.router.get("/alarms/{name}/history")(self.get_alarm_history)
         self.router.get("/")(self.get_target)
         self.router.put("/")(self.set_target)
         self.router.delete("/")(self.cancel)
@@ -231,11 +595,102 @@ class AlarmEndpoint(Endpoint[Alarm]):
         self.router.put("/snooze")(self.set_snooze)
         self.router.get("/snooze")(self.get_snooze)
         self.router.put("/trigger")(self.trigger)
+        self.router.get("/history")(self.get_history)
 
     def next_elapse(self) -> Optional[datetime]:
-        """Get next elapse point."""
+        """Get next elapse point, of any alarm."""
+        if self.alarms is not None:
+            return self.alarms.next_elapse
         return self.thing.next_elapse
 
+    def _alarm(self, name: str) -> Alarm:
+        assert self.alarms is not None
+        try:
+            return self.alarms[name]
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"No alarm {name}") from None
+
+    async def _describe(self, alarm: Alarm) -> dict:
+        # Let any rescheduling run, so the next elapse is current.
+        await asyncio.sleep(0)
+        return describe(alarm)
+
+    async def list_alarms(self) -> list[dict]:
+        """Get every alarm."""
+        assert self.alarms is not None
+        return [describe(x) for x in self.alarms]
+
+    async def get_alarm(self, name: str) -> dict:
+        """Get an alarm."""
+        return describe(self._alarm(name))
+
+    async def set_alarm(
+        self, name: str, target: time, rrule: Optional[str] = None
+    ) -> dict:
+        """Create or update an alarm.
+
+        `rrule` is FREQ=DAILY or FREQ=WEEKLY with BYDAY (and optionally UNTIL); an
+        empty rrule only elapses on one-off dates.
+        """
+        assert self.alarms is not None
+        recurrence = None
+        if rrule is not None:
+            try:
+                recurrence = (
+                    Recurrence.from_rrule(rrule) if rrule else Recurrence(weekdays=0)
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from None
+        alarm = self.alarms[name] if name in self.alarms else self.alarms.new(name)
+        if recurrence:
+            recurrence.dates = alarm.recurrence.dates
+            alarm.recurrence = recurrence
+        alarm.target = target
+        return await self._describe(alarm)
+
+    async def remove_alarm(self, name: str) -> dict:
+        """Remove an alarm."""
+        self._alarm(name)
+        assert self.alarms is not None
+        return describe(self.alarms.remove(name))
+
+    async def set_alarm_enabled(self, name: str, val: bool) -> dict:
+        """Enable or disable an alarm."""
+        alarm = self._alarm(name)
+        alarm.enabled = val
+        return await self._describe(alarm)
+
+    async def add_alarm_date(self, name: str, day: date) -> dict:
+        """Add a one-off date to an alarm."""
+        alarm = self._alarm(name)
+        alarm.recurrence.dates.add(day)
+        alarm.reschedule()
+        return await self._describe(alarm)
+
+    async def remove_alarm_date(self, name: str, day: date) -> dict:
+        """Remove a one-off date from an alarm."""
+        alarm = self._alarm(name)
+        alarm.recurrence.dates.discard(day)
+        alarm.reschedule()
+        return await self._describe(alarm)
+
+    async def skip_alarm(self, name: str) -> dict:
+        """Skip an alarm's next elapse."""
+        alarm = self._alarm(name)
+        alarm.skip_next()
+        return await self._describe(alarm)
+
+    async def get_alarm_history(self, name: str) -> list[ElapseRecord]:
+        """Get an alarm's recent elapses, oldest first."""
+        return list(self._alarm(name).history)
+
+    async def unskip_alarm(self, name: str) -> dict:
+        """Stop skipping an alarm's next elapse."""
+        alarm = self._alarm(name)
+        alarm.recurrence.skip = None
+        alarm.reschedule()
+        return await self._describe(alarm)
+
     # These are async to force them to be in the main thread
     async def get_target(self) -> Optional[time]:
         """Get alarm target."""
@@ -275,3 +730,7 @@ class AlarmEndpoint(Endpoint[Alarm]):
     async def trigger(self):
         """Trigger elapse."""
         self.thing.trigger()
+
+    async def get_history(self) -> list[ElapseRecord]:
+        """Get recent elapses, oldest first."""
+        return list(self.thing.history)
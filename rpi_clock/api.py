@@ -6,6 +6,7 @@ from gpiozero import LED
 
 from . import clock, hal, main
 from .alarm import AlarmEndpoint
+from .button import InputsEndpoint, dispatcher
 from .endpoint import Endpoint
 from .fadeable import FadeableEndpoint
 from .mopidy import mopidy_volume
@@ -37,7 +38,8 @@ volume = FadeableEndpoint(thing=hal.volume, prefix="/volume")
 mopidy_volume = FadeableEndpoint(thing=mopidy_volume, prefix="/mopidy-volume")
 backlight = FadeableEndpoint(thing=hal.backlight, prefix="/backlight")
 mute = PinEndpoint(thing=hal.mute, prefix="/mute")
-alarm = AlarmEndpoint(thing=clock.alarm, prefix="/alarm")
+alarm = AlarmEndpoint(thing=clock.alarm, alarms=clock.alarms, prefix="/alarm")
+inputs = InputsEndpoint(thing=dispatcher, prefix="/inputs")
 
 app.include_router(lamp.router)
 app.include_router(volume.router)
@@ -45,6 +47,7 @@ app.include_router(mopidy_volume.router)
 app.include_router(backlight.router)
 app.include_router(mute.router)
 app.include_router(alarm.router)
+app.include_router(inputs.router)
 
 
 @app.get("/")
@@ -1,28 +1,210 @@
 import asyncio
-from collections import UserDict
-from typing import Callable, Optional
-
+from bisect import bisect_left
+from collections import Counter, UserDict, defaultdict, deque
+from dataclasses import dataclass, field
+from functools import partial
+from time import monotonic
+from typing import Any, Callable, Optional, Union
+
+from fastapi import HTTPException
 from gpiozero import Device, Pin
 from gpiozero.pins import Factory
 from structlog import get_logger
 
+from .endpoint import Endpoint
 from .timer import Timer
 
 logger = get_logger()
 
+# When a hook became due, as (ticks, seconds after them).
+Origin = tuple[float, float]
+
+
+@dataclass
+class LatencyHistogram:
+    """Latencies counted in buckets up to each of `BOUNDS_MS`, and one beyond."""
+
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000)
+
+    counts: list[int] = field(
+        default_factory=lambda: [0] * (len(LatencyHistogram.BOUNDS_MS) + 1)
+    )
+    count: int = 0
+    total_s: float = 0
+    max_s: float = 0
+
+    def record(self, latency: float):
+        """Record a latency, in seconds."""
+        self.counts[bisect_left(self.BOUNDS_MS, latency * 1_000)] += 1
+        self.count += 1
+        self.total_s += latency
+        self.max_s = max(self.max_s, latency)
+
+    @property
+    def mean_s(self) -> float:
+        """Get mean latency."""
+        return self.total_s / self.count if self.count else 0
+
+    def percentile(self, percent: int) -> float:
+        """Get the upper bound of the bucket holding the `percent`th percentile."""
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(self.BOUNDS_MS, self.counts):
+            seen += count
+            if seen and seen >= rank:
+                return min(bound / 1_000, self.max_s)
+        return self.max_s
+
+    def to_json(self) -> dict:
+        """Get a json-serialisable summary."""
+        labels = [f"<={x}ms" for x in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_s": self.mean_s,
+            "p50_s": self.percentile(50),
+            "p99_s": self.percentile(99),
+            "max_s": self.max_s,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class InputDispatcher:
+    """One channel carrying edges from every input to the event loop.
+
+    Pin callbacks from any thread append `(input, ticks, edge)` to a single queue,
+    and only the first edge of a batch schedules a wakeup.  One task then routes
+    the whole batch to each input's state machine, and settles every input it
+    touched once.  Inputs may also `flush()` the channel themselves, so a timeout
+    never overtakes edges which happened before it.
+
+    A dispatcher serves one event loop at a time.
+    """
+
+    QUEUE_LEN = 256
+
+    def __init__(self, name: str = "inputs", queue_len: Optional[int] = None):
+        """Initialise a new dispatcher.  It starts when the first input registers."""
+        self.name = name
+        self.queue_len = queue_len or self.QUEUE_LEN
+        self._logger = logger.bind(name=name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._edges: deque[tuple["Input", float, Any]] = deque()
+        self._wake = asyncio.Event()
+        self._waking = False
+        self._task: Optional[asyncio.Task] = None
+        self.inputs: dict[str, "Input"] = {}
+        self.wakeups = 0
+        self.edges = 0
+        self.overflows = 0
+
+    def register(self, button: "Input"):
+        """Route edges to `button`, starting on the current loop if need be."""
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._edges.clear()
+            self._wake = asyncio.Event()
+            self._waking = False
+            self.inputs = {}
+            self._task = loop.create_task(self._run())
+        self.inputs[button.name] = button
+
+    def put(self, button: "Input", ticks: float, level: Any):
+        """Queue an edge from any thread.
+
+        If `queue_len` edges are already waiting, from any inputs, the new one is
+        dropped and counted against its input.
+        """
+        if len(self._edges) >= self.queue_len:
+            button.edge_overflows += 1
+            self.overflows += 1
+            return
+        self._edges.append((button, ticks, level))
+        # The loop clears this before flushing, so an edge appended after the flush
+        # started always schedules another wakeup.
+        if not self._waking:
+            self._waking = True
+            assert self._loop
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def flush(self):
+        """Route every queued edge, then settle the inputs which got one."""
+        touched: dict[int, Input] = {}
+        while self._edges:
+            button, ticks, level = self._edges.popleft()
+            self.edges += 1
+            touched[id(button)] = button
+            try:
+                button._handle_edge(ticks, level)
+            except Exception:
+                # Don't die here, or every input will become unresponsive.
+                button._logger.exception("Failed to handle edge")
+        for button in touched.values():
+            button._settle()
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            self._waking = False
+            self.wakeups += 1
+            self.flush()
+
+
+dispatcher = InputDispatcher()
+
 
 class Button(UserDict):
     """A button, api loosely inspired by Peter Hinch's micropython `Pushbutton`.
 
     This class assumes its `.callback()` will be called from elsewhere. It mostly exists
     for testing.
+
+    Gestures are recognised from the time each edge happened, not when the loop got
+    round to it, by the state machine in `GESTURES`.  Before each edge, any timeouts
+    which expired by then (by the edge's timestamp) are applied; a timer only
+    applies timeouts when no edge arrives to do so.  So a busy loop can delay
+    handlers, but can't turn a double click into two presses.
+
+    Handlers run one at a time, in order, from a bounded queue.  When it's full,
+    `policy` decides what gives: "drop-new" drops events whilst a handler runs,
+    "latest" keeps only the newest pending event, and "queue" keeps up to
+    `queue_len`, dropping any more.  Dropped and suppressed events and handler run
+    times are counted per hook.
+
+    `edge_latency` is a histogram of the time from the edge (or the timeout) which
+    made a hook due to its handler starting, and `handler_time` of how long the
+    handlers took.  A summary is logged at debug every `SUMMARY_EVERY` handlers.
     """
 
-    HOOKS = {"press", "release", "long", "double"}
+    HOOKS = {"press", "release", "long", "double", "repeat"}
     FALLING_EDGE = 0
     RISING_EDGE = 1
+    POLICIES = {"drop-new", "latest", "queue"}
+    SUMMARY_EVERY = 100
     instances = []
 
+    # (state, event): (actions, next state).  States are "idle"; "down", the first
+    # press held with the double window open; "held", held after it closed; "up",
+    # released within it; "double", the second press held; and "resolved", held
+    # after the gesture was decided.  "release" is skipped when suppressing, and
+    # "click" (the release hook, once a press is known to be neither long nor double)
+    # only runs when suppressing.  "hold" is long (and starts any repeats), or click
+    # if there's neither a long nor a repeat hook.
+    GESTURES = {
+        ("idle", "down"): (("press",), "down"),
+        ("down", "up"): (("release",), "up"),
+        ("down", "double_timeout"): ((), "held"),
+        ("down", "long_timeout"): (("hold",), "resolved"),
+        ("held", "up"): (("release", "click"), "idle"),
+        ("held", "long_timeout"): (("hold",), "resolved"),
+        ("up", "down"): (("press", "double"), "double"),
+        ("up", "double_timeout"): (("click",), "idle"),
+        ("double", "up"): (("release",), "idle"),
+        ("resolved", "up"): (("release",), "idle"),
+        ("resolved", "repeat"): (("repeat",), "resolved"),
+    }
+
     def __init__(
         self,
         inverted: bool = False,
@@ -31,9 +213,20 @@ class Button(UserDict):
         suppress: bool = False,
         name: str | None = None,
         blocking: bool = False,
+        inputs: Optional[InputDispatcher] = None,
+        repeat_ms: int = 100,
+        repeat_min_ms: int = 20,
+        repeat_accel: float = 0.85,
+        policy: str | None = None,
+        queue_len: int = 4,
     ):
-        self._event = asyncio.Event()
-        self._edge: int | None = None
+        """Initialise a new button.
+
+        Holding it for `long_ms` fires `long`, and then `repeat` every `repeat_ms`,
+        shrinking by `repeat_accel` each time down to `repeat_min_ms`.  `blocking` is
+        shorthand for the "drop-new" policy; otherwise it defaults to "queue".
+        """
+        self.edge_overflows = 0
         self.rising_edge = self.RISING_EDGE
         self.falling_edge = self.FALLING_EDGE
         if inverted:
@@ -44,40 +237,50 @@ class Button(UserDict):
         self._double_ms = double_ms
         self._long_ms = long_ms
         self.suppress = suppress
-        self._loop = asyncio.get_event_loop()
-        self._long_timer = Timer(
-            long_ms, lambda: asyncio.create_task(self.call("long"))
-        )
-
-        self._double_timer = Timer(double_ms, self._doubleclick_timeout)
-        self._double_pending = False
-        self._double_ran = False
+        self._ticks: Callable[[], float] = monotonic
+        self._ticks_diff: Callable[[float, float], float] = lambda a, b: a - b
+        self._gesture = "idle"
+        self._down_ticks = 0.0
+        self._first_down_ticks = 0.0
+        self._gesture_timer = Timer(fn=self._on_timeout)
+        self.repeat_ms = repeat_ms
+        self.repeat_min_ms = repeat_min_ms
+        self.repeat_accel = repeat_accel
+        self.repeat_count = 0
+        self._repeat_timer = Timer(fn=self._on_repeat)
         self.state = False
-        self._loop.create_task(self._button_check_loop())
-        self.name = name or f"Button-{len(self.instances)}"
+        self.name: str = name or f"Button-{len(self.instances)}"
         self.instances.append(self.name)
         self._logger = logger.bind(name=self.name)
-        self.blocking = blocking
+        self._inputs = inputs or dispatcher
+        self._inputs.register(self)
+        self.policy = policy or ("drop-new" if blocking else "queue")
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unknown policy {self.policy}")
+        self.queue_len = queue_len
+        self._pending: deque[tuple[str, Optional[Origin]]] = deque()
+        self._runner: Optional[asyncio.Task] = None
         self.in_progress = False
+        self.dropped: Counter[str] = Counter()
+        self.runs: Counter[str] = Counter()
+        self.run_s: defaultdict[str, float] = defaultdict(float)
+        self.suppressed: Counter[str] = Counter()
+        self.edge_latency = LatencyHistogram()
+        self.handler_time = LatencyHistogram()
 
-    async def _doubleclick_timeout(self):
-        """In suppress mode, work out if a double click has expired, and if so, call the
-        release fn if it exists."""
+    @property
+    def blocking(self) -> bool:
+        """Whether events are dropped whilst a handler runs."""
+        return self.policy == "drop-new"
 
-        self._double_pending = False
-        if not self.suppress:
-            return
+    @blocking.setter
+    def blocking(self, val: bool):
+        self.policy = "drop-new" if val else "queue"
 
-        if not self.data["release"]:
-            return
-
-        if (
-            self.state
-            and not self.data["long"]
-            or self.data["long"]
-            and not self._long_timer.running
-        ):
-            asyncio.create_task(self.call("release"))
+    @property
+    def pending_limit(self) -> int:
+        """Get how many events may wait behind a running handler."""
+        return {"drop-new": 0, "latest": 1}.get(self.policy, self.queue_len)
 
     @property
     def double_ms(self):
@@ -86,7 +289,6 @@ class Button(UserDict):
     @double_ms.setter
     def double_ms(self, val: int):
         self._double_ms = val
-        self._double_timer.duration = val
 
     @property
     def long_ms(self):
@@ -95,22 +297,52 @@ class Button(UserDict):
     @long_ms.setter
     def long_ms(self, val: int):
         self._long_ms = val
-        self._long_timer.duration = val
 
-    def _callback(self, level: int):
-        """Callback for button events.
+    def _callback(self, level: int, ticks: Optional[float] = None):
+        """Callback for button events, with the time of the edge if known.
 
         Note that this runs in a different thread context from the main event loop.
+        Edges are queued on the input dispatcher, so none are lost if several arrive
+        before the loop runs.
         """
-        self._edge = level
-        self._loop.call_soon_threadsafe(lambda: self._event.set())
+        self._inputs.put(self, self._ticks() if ticks is None else ticks, level)
 
-    async def call(self, hook: str):
-        """Call appropriate handler for given hook."""
-        if self.blocking and self.in_progress:
+    def _drop(self, hook: str):
+        self.dropped[hook] += 1
+        self._logger.debug(f"Dropped {hook}; handler busy ({self.policy}).")
+
+    def dispatch(self, hook: str, origin: Optional[Origin] = None):
+        """Run the handler for `hook`, or queue it subject to the policy.
+
+        `origin` is when the hook became due, as (ticks, seconds after them).
+        """
+        if not self._runner:
+            self._runner = asyncio.create_task(self._run(hook, origin))
             return
+        if len(self._pending) >= self.pending_limit:
+            if self.policy != "latest" or not self._pending:
+                self._drop(hook)
+                return
+            self._drop(self._pending.popleft()[0])
+        self._pending.append((hook, origin))
+
+    async def _run(self, hook: str, origin: Optional[Origin]):
+        """Run a handler, then any queued behind it, in order."""
+        try:
+            await self.call(hook, origin)
+            while self._pending:
+                await self.call(*self._pending.popleft())
+        finally:
+            self._runner = None
+
+    async def call(self, hook: str, origin: Optional[Origin] = None):
+        """Call appropriate handler for given hook."""
         self.in_progress = True
         self._logger.debug(f"Calling {hook}.")
+        if origin:
+            ticks, after = origin
+            self.edge_latency.record(self._ticks_diff(self._ticks(), ticks) - after)
+        start = monotonic()
         try:
             x = self.data[hook](self)
             if asyncio.iscoroutine(x):
@@ -118,56 +350,137 @@ class Button(UserDict):
         except Exception:
             # Don't die here, or the buttons will become unresponsive.
             self._logger.exception("Failed to call handler")
-        self.in_progress = False
-
-    async def _button_check_loop(self):
-        """Respond to events from the callback."""
-        while True:
-            await self._event.wait()
-            edge = self._edge
-            self._event.clear()
-            if edge == self.falling_edge:
-                self._logger.debug("Got falling edge.")
-                self.state = True
-                if self.data["press"]:
-                    asyncio.create_task(self.call("press"))
-
-                if self.data["long"]:
-                    self._long_timer.trigger()
-
-                if self.data["double"]:
-                    if self._double_timer.running:
-                        self._double_timer.cancel()
-                        self._double_pending = False
-                        self._double_ran = True
-                        asyncio.create_task(self.call("double"))
-                    else:
-                        self._double_timer.trigger()
-                        await asyncio.sleep(0)
-                        self._double_pending = True
-
-            elif edge == self.rising_edge:
-                self._logger.debug("Got rising edge.")
-                self.state = False
-                if self.data["release"]:
-                    if self.suppress:
-                        if (
-                            not self._double_pending
-                            and not self._double_ran
-                            and (
-                                not self.data["long"]
-                                or (self.data["long"] and self._long_timer.running)
-                            )
-                        ):
-                            asyncio.create_task(self.call("release"))
-                    else:
-                        asyncio.create_task(self.call("release"))
-
-                    self._long_timer.cancel()
-                    self._double_ran = False
-
-            else:
-                raise ValueError(f"Unknown edge {edge} received.")
+        finally:
+            elapsed = monotonic() - start
+            self.runs[hook] += 1
+            self.run_s[hook] += elapsed
+            self.handler_time.record(elapsed)
+            self.in_progress = False
+        if not self.handler_time.count % self.SUMMARY_EVERY:
+            self._logger.debug("Handler latency", **self.summary())
+
+    def summary(self) -> dict:
+        """Get a summary of latency and lost events."""
+        return {
+            "edge_latency": self.edge_latency.to_json(),
+            "handler_time": self.handler_time.to_json(),
+            "runs": dict(self.runs),
+            "dropped": dict(self.dropped),
+            "suppressed": dict(self.suppressed),
+            "edge_overflows": self.edge_overflows,
+        }
+
+    def _drain(self):
+        """Handle every queued edge, then any timeouts expired since."""
+        self._inputs.flush()
+        self._settle()
+
+    def _settle(self):
+        """Apply expired timeouts, and time the next."""
+        remaining = self._advance(self._ticks())
+        if remaining is None:
+            self._gesture_timer.cancel()
+        else:
+            self._gesture_timer.duration = remaining * 1_000
+            self._gesture_timer.trigger()
+
+    def _on_timeout(self):
+        # Edges which happened before the timeout must be seen first.
+        self._drain()
+
+    def repeat_interval_ms(self, count: int) -> float:
+        """Get the interval before repeat number `count + 1`."""
+        return max(self.repeat_min_ms, self.repeat_ms * self.repeat_accel**count)
+
+    def _arm_repeat(self):
+        self._repeat_timer.duration = self.repeat_interval_ms(self.repeat_count)
+        self._repeat_timer.trigger()
+
+    def _on_repeat(self):
+        self._drain()
+        if self._gesture != "resolved":
+            return
+        self.repeat_count += 1
+        self._transition("repeat", (self._ticks(), 0))
+        self._arm_repeat()
+
+    def _handle_edge(self, ticks: float, edge: int):
+        """Handle one edge, which happened at `ticks`."""
+        if edge == self.falling_edge:
+            self._logger.debug("Got falling edge.")
+            event = "down"
+        elif edge == self.rising_edge:
+            self._logger.debug("Got rising edge.")
+            event = "up"
+        else:
+            raise ValueError(f"Unknown edge {edge} received.")
+        self._advance(ticks)
+        self.state = event == "down"
+        if self.state:
+            self._down_ticks = ticks
+            if self._gesture == "idle":
+                self._first_down_ticks = ticks
+        self._transition(event, (ticks, 0))
+        # Timeouts already due (e.g. no double hook) apply at once.
+        self._advance(ticks)
+
+    def _timeouts(self):
+        """Get the pending timeouts as (event, base ticks, delay in s)."""
+        double_s = self._double_ms / 1_000 if self.data["double"] else 0
+        double = ("double_timeout", self._first_down_ticks, double_s)
+        if self.data["long"] or self.data["repeat"]:
+            long = ("long_timeout", self._down_ticks, self._long_ms / 1_000)
+        else:
+            long = None
+        if self._gesture == "down":
+            return [double, long] if long else [double]
+        if self._gesture == "held":
+            if long:
+                return [long]
+            # Without a long hook, an expired double window decides a click at
+            # once; without either, it waits for the release.
+            return (
+                [("long_timeout", self._down_ticks, 0)] if self.data["double"] else []
+            )
+        if self._gesture == "up":
+            return [double]
+        return []
+
+    def _advance(self, ticks: float) -> Optional[float]:
+        """Apply timeouts due by `ticks`, returning seconds until the next, if any."""
+        while timeouts := self._timeouts():
+            remaining, event, base, delay = min(
+                (delay - self._ticks_diff(ticks, base), event, base, delay)
+                for event, base, delay in timeouts
+            )
+            if remaining > 0:
+                return remaining
+            self._transition(event, (base, delay))
+        return None
+
+    def _transition(self, event: str, origin: Origin):
+        try:
+            actions, self._gesture = self.GESTURES[(self._gesture, event)]
+        except KeyError:
+            # e.g. a repeated edge; nothing to do.
+            return
+        if self._gesture != "resolved":
+            self._repeat_timer.cancel()
+        for action in actions:
+            if action == "hold":
+                if self.data["repeat"]:
+                    self.repeat_count = 0
+                    self._arm_repeat()
+                action = "long" if self.data["long"] or self.data["repeat"] else "click"
+            if action == "release" and self.suppress:
+                self.suppressed[action] += 1
+                continue
+            if action == "click":
+                if not self.suppress:
+                    continue
+                action = "release"
+            if self.data[action]:
+                self.dispatch(action, origin)
 
     def __setitem__(self, key: str, fn: Callable | None = None):
         """Set a function to run."""
@@ -206,7 +519,175 @@ class ZeroButton(Button):
         pin.when_changed = self._callback
         pin.edges = "both"
         self._pin = pin
+        self._ticks = pin_factory.ticks
+        self._ticks_diff = pin_factory.ticks_diff
 
-    def _callback(self, ticks: int, state: int):
+    def _callback(self, ticks: float, state: int):
         """Handle state changes."""
-        super()._callback(state)
+        super()._callback(state, ticks)
+
+
+class RotaryEncoder(UserDict):
+    """A quadrature rotary encoder on two gpiozero `Pin`s.
+
+    Edges from either pin go through the input dispatcher like a button's, and are
+    decoded in order by `TRANSITIONS` into quarter steps, so contact bounce just
+    steps back and forth.  Every `steps_per_detent` steps make a detent.
+
+    Detents are delivered in batches: the `turn` hook is called with the encoder
+    and the detents turned since its last call, positive clockwise.  Whilst it
+    runs, further detents accumulate for the next call, so a fast spin costs a few
+    handler calls rather than one per detent.  Latency is measured from the last
+    edge of each batch.
+    """
+
+    HOOKS = {"turn"}
+    STEPS_PER_DETENT = 4
+    # Quarter steps for each (previous AB << 2 | AB); clockwise is 11, 10, 00, 01.
+    TRANSITIONS = (0, 1, -1, 0, -1, 0, 0, 1, 1, 0, 0, -1, 0, -1, 1, 0)
+
+    def __init__(
+        self,
+        pin_a: int,
+        pin_b: int,
+        name: str | None = None,
+        steps_per_detent: int | None = None,
+        pin_factory: Optional[Factory] = None,
+        inputs: Optional[InputDispatcher] = None,
+    ):
+        """Initialise a new encoder, pulled up with its common pin to ground."""
+        self.data = {k: None for k in self.HOOKS}
+        self.name: str = name or f"Encoder-{pin_a}-{pin_b}"
+        self._logger = logger.bind(name=self.name)
+        self.steps_per_detent = steps_per_detent or self.STEPS_PER_DETENT
+        pin_factory = pin_factory or Device._default_pin_factory()
+        self._pins: list[Pin] = []
+        # Pins only hold weak references to their callbacks.
+        self._callbacks = [partial(self._callback, x) for x in range(2)]
+        for pin_no, callback in zip((pin_a, pin_b), self._callbacks):
+            pin: Pin = pin_factory.pin(pin_no)
+            pin.function = "input"
+            pin.pull = "up"
+            pin.when_changed = callback
+            pin.edges = "both"
+            self._pins.append(pin)
+        self._ticks = pin_factory.ticks
+        self._ticks_diff = pin_factory.ticks_diff
+        self._state = self._pins[0].state << 1 | self._pins[1].state
+        self._steps = 0
+        self._delta = 0
+        self.position = 0
+        self.last_ticks: Optional[float] = None
+        self.edge_overflows = 0
+        self.errors = 0
+        self.dispatches = 0
+        self.edge_latency = LatencyHistogram()
+        self.handler_time = LatencyHistogram()
+        self._runner: Optional[asyncio.Task] = None
+        self._inputs = inputs or dispatcher
+        self._inputs.register(self)
+
+    def _callback(self, channel: int, ticks: float, state: int):
+        """Handle state changes.  This runs in the pin's thread."""
+        self._inputs.put(self, ticks, (channel, state))
+
+    def _handle_edge(self, ticks: float, edge: tuple[int, int]):
+        """Decode one edge, which happened at `ticks`."""
+        channel, level = edge
+        bit = 1 << (1 - channel)
+        state = self._state | bit if level else self._state & ~bit
+        if state == self._state:
+            # An edge to where we already were means one went missing.
+            self.errors += 1
+            return
+        self._steps += self.TRANSITIONS[self._state << 2 | state]
+        self._state = state
+        self.last_ticks = ticks
+        # Truncate towards zero, so steps back and forth never make a detent.
+        detents = int(self._steps / self.steps_per_detent)
+        if detents:
+            self._steps -= detents * self.steps_per_detent
+            self._delta += detents
+            self.position += detents
+
+    def _settle(self):
+        """Deliver any detents, unless a delivery is already running."""
+        if self._delta and self.data["turn"] and not self._runner:
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self._delta:
+                delta, self._delta = self._delta, 0
+                await self.call(delta)
+        finally:
+            self._runner = None
+
+    async def call(self, delta: int):
+        """Call the turn handler with `delta` detents."""
+        self.dispatches += 1
+        self._logger.debug(f"Calling turn with {delta:+}.")
+        if self.last_ticks is not None:
+            self.edge_latency.record(self._ticks_diff(self._ticks(), self.last_ticks))
+        start = monotonic()
+        try:
+            x = self.data["turn"](self, delta)
+            if asyncio.iscoroutine(x):
+                await x
+        except Exception:
+            self._logger.exception("Failed to call handler")
+        self.handler_time.record(monotonic() - start)
+
+    def summary(self) -> dict:
+        """Get a summary of latency and lost edges."""
+        return {
+            "edge_latency": self.edge_latency.to_json(),
+            "handler_time": self.handler_time.to_json(),
+            "position": self.position,
+            "dispatches": self.dispatches,
+            "errors": self.errors,
+            "edge_overflows": self.edge_overflows,
+        }
+
+    def __setitem__(self, key: str, fn: Callable | None = None):
+        """Set a function to run."""
+        if key not in self.HOOKS:
+            raise ValueError(f"Function {key} is not a valid hook")
+        self.data[key] = fn
+
+    def __getitem__(self, key: str):
+        return self.data[key]
+
+    def __delitem__(self, key: str):
+        self.data[key] = None
+
+
+Input = Union[Button, RotaryEncoder]
+
+
+class InputsEndpoint(Endpoint[InputDispatcher]):
+    """An endpoint reporting on the inputs of a dispatcher."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialise a new inputs endpoint."""
+        super().__init__(*args, **kwargs)
+        self.router.get("/")(self.get_summaries)
+        self.router.get("/{name}")(self.get_summary)
+
+    def get_summaries(self):
+        """Get latency and lost events for every input."""
+        return {
+            "dispatcher": {
+                "wakeups": self.thing.wakeups,
+                "edges": self.thing.edges,
+                "overflows": self.thing.overflows,
+            },
+            "inputs": {k: v.summary() for k, v in self.thing.inputs.items()},
+        }
+
+    def get_summary(self, name: str):
+        """Get latency and lost events for one input."""
+        try:
+            return self.thing.inputs[name].summary()
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"No input {name}") from None
@@ -1,23 +1,30 @@
 import asyncio
 from datetime import time, timedelta
+from functools import partial
 from pathlib import Path
 from time import monotonic, strftime
+from typing import Callable
 
 from structlog import get_logger
 
-from .alarm import CachingAlarm
+from .alarm import Alarms, CachingAlarm, stage
 from .display import LcdDisplay, Menu, MenuItem
 from .hal import down_button, enter_button, lamp, lcd, mute, up_button, volume
-from .mopidy import mopidy_volume, play, stop
+from .mopidy import mopidy_volume, play, player, stop
 from .reactive import Watched
+from .timeline import Timeline, Track
 
 logger = get_logger()
 
 
-old = None
+# The enter button's press handler whilst nothing rings, and the wake timeline (once
+# started) of each alarm ringing, by name.
+idle_press: Callable | None = None
+ringing: dict[str, Timeline | None] = {}
 
 
 FADE_DURATION = 300
+PREPARE_LEAD = 120
 START_VOLUME = 4 / 50
 MAX_VOLUME = 0.15
 MAX_SOFTWARE_VOLUME = 0.78
@@ -26,58 +33,87 @@ MIN_BRIGHTNESS = 0.03
 
 # TODO move this to alarm, as it needs to be fade aware.
 # TODO correct for fade duration
-async def ring():
+async def ring(name: str):
     """Ring."""
-    global old
-    old = enter_button["press"]
-    enter_button["press"] = lambda _: alarm.cancel()
-    logger.debug("ring ring")
+    global idle_press
+    if not ringing:
+        idle_press = enter_button["press"]
+        enter_button["press"] = lambda _: alarms.cancel()
+    ringing[name] = None
+    logger.debug("ring ring", alarm=name)
     display.current_screen = ringing_screen
     try:
-        await lamp.fade(duty=500, duration=FADE_DURATION)
-        await play()
-        await volume.set_percent_duty(MAX_VOLUME)
+        with stage("lamp"):
+            await lamp.fade(duty=500, duration=FADE_DURATION)
+        with stage("play"):
+            await play()
+        with stage("volume"):
+            await volume.set_percent_duty(MAX_VOLUME)
         mute.off()
-        asyncio.create_task(
-            mopidy_volume.fade(percent_duty=MAX_SOFTWARE_VOLUME, duration=30)
-        )
         assert lcd.backlight
-        asyncio.create_task(lcd.backlight.fade(percent_duty=1))
+        wake_timeline = Timeline(
+            Track(mopidy_volume, percent_duty=MAX_SOFTWARE_VOLUME, duration=30),
+            Track(lcd.backlight, percent_duty=1),
+            name=f"wake-{name}",
+        )
+        ringing[name] = wake_timeline
+        asyncio.create_task(timed("wake", wake_timeline.start()))
     except asyncio.CancelledError:
         pass
     except Exception:
         logger.exception("Error in ring")
 
 
-async def end_alarm(*_):
-    """Stop ringing."""
+async def timed(name: str, task: asyncio.Task):
+    with stage(name):
+        await task
+
+
+async def prepare():
+    """Get ready to ring: queue the music and check the hardware."""
+    await asyncio.gather(player.prepare(), lamp.reconcile(), mopidy_volume.reconcile())
+
+
+async def end_alarm(name: str):
+    """Stop ringing, once no other alarm still is."""
+    if name not in ringing:
+        return
+    if wake_timeline := ringing.pop(name):
+        wake_timeline.cancel()
+    if ringing:
+        return
     asyncio.create_task(lamp.fade(duty=0))
-    enter_button["press"] = old
-    await mopidy_volume.fade(duty=0, duration=10)
+    enter_button["press"] = idle_press
+    with stage("end.volume"):
+        await mopidy_volume.fade(duty=0, duration=10)
     mute.on()
-    await stop()
+    with stage("end.stop"):
+        await stop()
     assert lcd.backlight
-    await lcd.backlight.fade(duty=0)
+    with stage("end.backlight"):
+        await lcd.backlight.fade(duty=0)
     display.current_screen = main_screen
 
 
-fade_button_lock = asyncio.Lock()
+fade_delta = 0.0
 
 
-async def fade_up_down(button):
-    MANUAL_FADE_DURATION = 0.01
-    async with fade_button_lock:
-        if await lamp.get_duty() > 0:
-            delta = -0.005
-        else:
-            delta = 0.005
-            await lamp.set_percent_duty(MIN_BRIGHTNESS)
-        while button.state:
-            current = await lamp.get_percent_duty()
-            await lamp.set_percent_duty(current + delta)
-            await asyncio.sleep(MANUAL_FADE_DURATION)
-        if await lamp.get_percent_duty() < MIN_BRIGHTNESS:
-            await lamp.set_percent_duty(0)
+async def start_fade(_):
+    """Start fading the lamp from a held button, down if it's on, else up."""
+    global fade_delta
+    if await lamp.get_duty() > 0:
+        fade_delta = -0.005
+    else:
+        fade_delta = 0.005
+        await lamp.set_percent_duty(MIN_BRIGHTNESS)
+
+
+async def fade_up_down(_):
+    """Step the lamp on by one repeat of a held button."""
+    current = await lamp.get_percent_duty() + fade_delta
+    if current < MIN_BRIGHTNESS and fade_delta < 0:
+        current = 0
+    await lamp.set_percent_duty(current)
 
 
 async def up(*args):
@@ -88,9 +124,8 @@ async def down(*args):
     await lamp.set_percent_duty(await lamp.get_percent_duty() - 0.02)
 
 
-async def incr():
-    while up_button.state:
-        await lamp.set_duty(await lamp.get_duty() + 1)
+async def incr(_):
+    await lamp.set_duty(await lamp.get_duty() + 1)
 
 
 async def toggle_backlight(*args):
@@ -101,26 +136,45 @@ async def toggle_backlight(*args):
         await lcd.backlight.fade(percent_duty=1)
 
 
-enter_button["long"] = fade_up_down
+enter_button.repeat_ms = 40
+enter_button.repeat_min_ms = 10
+enter_button["long"] = start_fade
+enter_button["repeat"] = fade_up_down
 
 
-alarm = CachingAlarm(
-    dbfile=Path("~/alarm.json").expanduser(),
-    callback=ring,
-    cancel_callback=end_alarm,
-)
-alarm.adjust_alarm = lambda val: (val - timedelta(seconds=FADE_DURATION))
+def adjust_alarm(val):
+    return val - timedelta(seconds=FADE_DURATION)
+
+
+def new_alarm(name: str, **kwargs) -> CachingAlarm:
+    alarm = CachingAlarm(
+        name=name,
+        callback=partial(ring, name),
+        cancel_callback=partial(end_alarm, name),
+        prepare_callback=prepare,
+        prepare_lead_s=PREPARE_LEAD,
+        **kwargs,
+    )
+    alarm.adjust_alarm = adjust_alarm
+    return alarm
+
+
+alarms = Alarms(factory=new_alarm)
+default_alarm = new_alarm("default", dbfile=Path("~/alarm.json").expanduser())
+alarm = alarms.add(default_alarm)
+for name in default_alarm.store.section(CachingAlarm.SECTION):
+    if name not in alarms:
+        alarms.new(name)
 
 
 def display_alarm(old, new):
-    assert alarm.target
     main_screen[0] = "alarm {}: {}".format(
-        "Off" if alarm.state == alarm.OFF else "On",
-        alarm.target.strftime("%H:%M"),
+        "Off" if new is None else "On",
+        new.strftime("%H:%M") if new else "--:--",
     )
 
 
-alarm._next_elapse.callback = display_alarm
+alarms._next_elapse.callback = display_alarm
 
 display = LcdDisplay(lcd=lcd)
 main_screen = display.new_screen("main-screen")
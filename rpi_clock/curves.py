@@ -0,0 +1,59 @@
+"""Easing and perceptual brightness curves for fades.
+
+Curves map linear progress in [0, 1] onto output in [0, 1].  Rather than evaluating
+them every step, fades look duties up in tables precomputed once per curve and range.
+"""
+
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Literal, get_args
+
+GAMMA = 2.2
+LOG_BASE = 100
+
+Curve = Literal[
+    "linear", "ease-in", "ease-out", "ease-in-out", "cie1931", "gamma", "log"
+]
+
+
+def _cie1931(x: float) -> float:
+    """Get relative luminance for lightness `x`, per CIE 1931."""
+    lightness = x * 100
+    if lightness <= 8:
+        return lightness / 903.3
+    return ((lightness + 16) / 116) ** 3
+
+
+CURVES: dict[str, Callable[[float], float]] = {
+    "linear": lambda x: x,
+    "ease-in": lambda x: x * x,
+    "ease-out": lambda x: 1 - (1 - x) ** 2,
+    "ease-in-out": lambda x: x * x * (3 - 2 * x),
+    "cie1931": _cie1931,
+    "gamma": lambda x: x**GAMMA,
+    "log": lambda x: (LOG_BASE**x - 1) / (LOG_BASE - 1),
+}
+assert set(CURVES) == set(get_args(Curve))
+
+
+@lru_cache(maxsize=32)
+def lut(curve: Curve, min_duty: int, max_duty: int) -> array:
+    """Get a table of duty by position along `curve` between `min_duty` and `max_duty`.
+
+    There is one position per duty in the range, so tables are as fine as the output.
+    Tables are monotonic, so positions can be looked up with `position()`.
+    """
+    try:
+        fn = CURVES[curve]
+    except KeyError:
+        raise ValueError(f"Unknown curve {curve}") from None
+    span = max_duty - min_duty
+    return array(
+        "l", (min_duty + round(fn(i / (span or 1)) * span) for i in range(span + 1))
+    )
+
+
+def position(table: array, duty: int) -> int:
+    """Get the first position in `table` at or above `duty`."""
+    return min(bisect_left(table, duty), len(table) - 1)
@@ -0,0 +1,90 @@
+"""A dedicated thread for blocking hardware io."""
+
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import monotonic
+from typing import Callable, TypeVar
+
+from structlog import get_logger
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+
+@dataclass
+class CommandStats:
+    """Latency statistics for one kind of command."""
+
+    count: int = 0
+    total_s: float = 0
+    max_s: float = 0
+    max_wait_s: float = 0
+    last_s: float = 0
+
+    def record(self, latency: float, wait: float):
+        """Record a completed command."""
+        self.count += 1
+        self.total_s += latency
+        self.max_s = max(self.max_s, latency)
+        self.max_wait_s = max(self.max_wait_s, wait)
+        self.last_s = latency
+
+    @property
+    def mean_s(self) -> float:
+        """Get mean latency."""
+        return self.total_s / self.count if self.count else 0
+
+
+class HardwareExecutor:
+    """A single worker thread which owns a device, fed with commands from asyncio.
+
+    Commands run one at a time in the order they were submitted, so anything run here
+    has exclusive access to the device without blocking the event loop.
+    """
+
+    def __init__(self, name: str):
+        """Initialise a new executor and its worker thread."""
+        self.name = name
+        self._logger = logger.bind(name=name)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.stats: defaultdict[str, CommandStats] = defaultdict(CommandStats)
+
+    async def run(self, command: str, fn: Callable[..., T], *args) -> T:
+        """Run `fn(*args)` in the worker thread, recording latency against `command`.
+
+        Latency runs from submission to completion, so includes time spent queued.
+        """
+        submitted = monotonic()
+        started = submitted
+
+        def timed() -> T:
+            nonlocal started
+            started = monotonic()
+            return fn(*args)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, timed)
+        finally:
+            self.stats[command].record(monotonic() - submitted, started - submitted)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Get a summary of latency by command."""
+        return {
+            k: {
+                "count": v.count,
+                "mean_s": v.mean_s,
+                "max_s": v.max_s,
+                "max_wait_s": v.max_wait_s,
+                "last_s": v.last_s,
+            }
+            for k, v in self.stats.items()
+        }
+
+    def shutdown(self):
+        """Stop the worker thread once queued commands have run."""
+        self._logger.debug("Shutting down", latency=self.summary())
+        self._executor.shutdown(wait=False)
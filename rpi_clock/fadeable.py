@@ -1,6 +1,9 @@
 import asyncio
 from abc import ABC, abstractmethod
-from json import dump, load
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from json import load
 from pathlib import Path
 from time import monotonic, sleep
 from typing import Optional, cast
@@ -12,18 +15,85 @@ from gpiozero.pins import Factory
 from gpiozero.pins.native import NativeFactory
 from rpi_hardware_pwm import HardwarePWM
 from structlog import get_logger
-from xdg_base_dirs import xdg_cache_home
 
+from .curves import Curve, lut, position
 from .endpoint import Endpoint
+from .executor import HardwareExecutor
+from .store import SettingsStore, default_cache_dir, shared_store
 
 logger = get_logger()
 
 
+@dataclass
+class FadePlan:
+    """A fade between two positions in a curve's table, against a fixed deadline."""
+
+    table: array
+    origin: int
+    span: int
+    start: float
+    duration: float
+    duty: int
+    frame_s: float
+
+    @property
+    def deadline(self) -> float:
+        """Get the monotonic time the fade should finish by."""
+        return self.start + self.duration
+
+    def duty_at(self, now: float) -> int:
+        """Get the duty due at monotonic time `now`."""
+        if now >= self.deadline:
+            return self.table[self.origin + self.span]
+        return self.table[
+            self.origin + round(self.span * (now - self.start) / self.duration)
+        ]
+
+    def next_frame(self, now: float) -> float:
+        """Get the delay from `now` until the next frame, skipping any missed."""
+        elapsed = now - self.start
+        return (elapsed // self.frame_s + 1) * self.frame_s - elapsed
+
+
+async def yield_if_short(delay: float) -> bool:
+    """Just yield if `delay` is too short to sleep, returning whether it did."""
+    # asyncio can't time sleeps much under a millisecond.
+    if delay > 1e-3:
+        return False
+    await asyncio.sleep(0)
+    return True
+
+
+def _percentile(samples: list[float], percent: int) -> float:
+    if not samples:
+        return 0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, len(samples) * percent // 100)]
+
+
+@dataclass
+class FadeStats:
+    """How a fade actually went."""
+
+    duty: int
+    duration: float
+    steps: int
+    interval_p50_s: float
+    interval_p99_s: float
+    late_p99_s: float
+    retries: int
+    resets: int
+    total_s: float
+    overrun_s: float
+    cancelled: bool
+
+
 class Fadeable(ABC):
     """Base Class for a fadeable output."""
 
     instances = []
     max_duty: int
+    FADE_HISTORY = 32
 
     def __init__(
         self,
@@ -31,19 +101,45 @@ class Fadeable(ABC):
         max_fade_freq_hz: int = 50,
         name: Optional[str] = None,
         max_duty: int = 100,
+        coalesce: bool = False,
+        shadow: bool = True,
+        reconcile_s: Optional[float] = None,
     ):
-        """Initialise a new fadeable object."""
+        """Initialise a new fadeable object.
+
+        If `coalesce` is set, duties requested whilst a hardware write is in flight
+        are not queued: only the newest is kept, and written next.
+
+        If `shadow` is set, the duty is read from hardware only until it is first
+        known, and thereafter served from a copy updated on every write.  If
+        `reconcile_s` is also set, the copy is checked against hardware that often.
+        """
         name = name or f"{__name__}-{len(self.instances)}"
         self.name = name
         self.instances.append(name)
         self._logger = logger.bind(name=name)
         self.max_fade_freq_hz = max_fade_freq_hz
-        self._fade_task = None
+        self._fade_task: Optional[asyncio.Future[float]] = None
+        self._plan: Optional[FadePlan] = None
+        self._retargeted = asyncio.Event()
         self._duty = 0
+        self.shadow = shadow
+        self._shadow_valid = False
+        self.reconcile_s = reconcile_s
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self.drift_count = 0
+        self.fade_history: deque[FadeStats] = deque(maxlen=self.FADE_HISTORY)
+        self.hardware_retries = 0
+        self.hardware_resets = 0
         self._fade_lock = asyncio.Lock()
         self._max_duty = max_duty
         self.max_duty = max_duty
         self.min_duty = 0
+        self.coalesce = coalesce
+        self._pending_duty: Optional[int] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.writes_dropped = 0
+        self.writes_coalesced = 0
 
     def set_max_duty(self, duty: Optional[int]):
         if duty is None:
@@ -63,18 +159,88 @@ class Fadeable(ABC):
         duty: int | None = None,
         percent_duty: float | None = None,
         duration: float = 1,
-    ):
-        """Fade from current state in a given time."""
+        curve: Curve = "linear",
+    ) -> float:
+        """Fade from current state in a given time, following `curve`.
+
+        Returns how far the fade overran its deadline, in seconds.
+        """
+        duty = self.target_duty(duty, percent_duty)
+        table = lut(curve, self.min_duty, self.max_duty)
+
+        self.cancel_fade()
+        async with self._fade_lock:
+            self._fade_task = asyncio.create_task(self._fade(duty, duration, table))
+            overrun = await self._fade_task
+            self._fade_task = None
+        return overrun
+
+    async def retarget(
+        self,
+        *,
+        duty: int | None = None,
+        percent_duty: float | None = None,
+        duration: float | None = None,
+        curve: Curve | None = None,
+    ) -> float:
+        """Change the target of the running fade in place, or start a new fade.
+
+        The running fade carries on from wherever it has got to, reaching the new
+        target `duration` seconds from now, or by its original deadline if not given.
+
+        Returns how far the fade overran its deadline, in seconds.
+        """
+        duty = self.target_duty(duty, percent_duty)
+        plan, task = self._plan, self._fade_task
+        if not plan or not task:
+            return await self.fade(
+                duty=duty,
+                duration=1 if duration is None else duration,
+                curve=curve or "linear",
+            )
+
+        now = monotonic()
+        table = lut(curve, self.min_duty, self.max_duty) if curve else plan.table
+        if duration is None:
+            duration = max(0.0, plan.deadline - now)
+        self._plan = self.plan_fade(duty, duration, table, self._duty, now)
+        self._retargeted.set()
+        return await asyncio.shield(task)
+
+    def target_duty(self, duty: int | None, percent_duty: float | None) -> int:
+        """Resolve a target given as either a duty or a percentage duty."""
         if duty is None and percent_duty is None:
             raise ValueError("One of percent_duty or duty must be supplied.")
         if duty is None:
             duty = self._convert_duty(cast(float, percent_duty))
+        return duty
+
+    @property
+    def plan(self) -> Optional[FadePlan]:
+        """The plan of the running fade, if any."""
+        return self._plan
+
+    def claim_fade(self, plan: FadePlan) -> asyncio.Future[float]:
+        """Register `plan` as the running fade, for a caller driving it itself.
 
+        Any running fade is cancelled.  Until `release_fade()`, `fade()` and
+        `cancel_fade()` cancel the returned future, and `retarget()` replaces `plan`:
+        the caller should follow `self.plan` each frame, and stop once the future is
+        done.
+        """
         self.cancel_fade()
-        async with self._fade_lock:
-            self._fade_task = asyncio.create_task(self._fade(duty, duration))
-            await self._fade_task
+        self._plan = plan
+        self._retargeted.clear()
+        self._fade_task = asyncio.get_running_loop().create_future()
+        return self._fade_task
+
+    def release_fade(self, fade: asyncio.Future[float], overrun: float):
+        """Finish a fade claimed with `claim_fade()`, which overran by `overrun`."""
+        if self._fade_task is fade:
             self._fade_task = None
+            self._plan = None
+        if not fade.done():
+            fade.set_result(overrun)
 
     def cancel_fade(self):
         """Cancel a running fade.
@@ -87,6 +253,42 @@ class Fadeable(ABC):
     async def start(self) -> None:
         self._logger.info("Zeroing")
         await self.set_duty(0)
+        self.start_reconciling()
+
+    def start_reconciling(self):
+        """Start checking the shadow duty against hardware in the background."""
+        if self.shadow and self.reconcile_s and not self._reconcile_task:
+            self._reconcile_task = asyncio.create_task(self._reconcile_loop())
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_s)
+            try:
+                await self.reconcile()
+            except Exception:
+                self._logger.exception("Failed to reconcile duty")
+
+    async def reconcile(self) -> bool:
+        """Check the shadow duty against hardware, correcting any drift.
+
+        Returns whether the shadow duty had drifted.
+        """
+        if self._writer or self._plan:
+            # A write is in progress; the shadow is about to change anyway.
+            return False
+        shadow = self._duty
+        duty = await self.get_hardware_duty()
+        if self._duty != shadow or duty == shadow:
+            return False
+        self.drift_count += 1
+        self._logger.warning(f"Duty drifted from {shadow} to {duty}.")
+        self._update_shadow(duty)
+        return True
+
+    def _update_shadow(self, val: int):
+        """Record `val` as the duty currently in hardware."""
+        self._duty = val
+        self._shadow_valid = True
 
     def _ceil(self, duty) -> int:
         return min(self.max_duty, duty)
@@ -98,12 +300,51 @@ class Fadeable(ABC):
         """Set duty."""
         # only floor to 0 to allow turning off.
         val = max(self._ceil(val), 0)
-        await self.set_hardware_duty(val)
-        self._duty = val
+        if self.coalesce:
+            await self._set_duty_coalesced(val)
+        else:
+            await self.set_hardware_duty(val)
+            self._update_shadow(val)
+
+    async def _set_duty_coalesced(self, val: int):
+        """Set duty, piggybacking on any write in flight.
+
+        Returns once `val`, or a duty requested after it, has been written.
+        """
+        if self._pending_duty is not None:
+            self.writes_dropped += 1
+        self._pending_duty = val
+        if self._writer:
+            self.writes_coalesced += 1
+        else:
+            self._writer = asyncio.create_task(self._drain_writes())
+        await asyncio.shield(self._writer)
+
+    async def _drain_writes(self):
+        try:
+            while self._pending_duty is not None:
+                val, self._pending_duty = self._pending_duty, None
+                await self.set_hardware_duty(val)
+                self._update_shadow(val)
+        finally:
+            self._pending_duty = None
+            self._writer = None
 
     async def get_duty(self) -> int:
-        """Get duty."""
-        return await self.get_hardware_duty()
+        """Get duty, from the shadow copy if possible."""
+        if self.shadow and self._shadow_valid:
+            return self._duty
+        duty = await self.get_hardware_duty()
+        self._update_shadow(duty)
+        return duty
+
+    async def set_fade_duty(self, val: int):
+        """Set duty for an intermediate step of a fade.
+
+        Backends may override this to trade verification for speed, as the final
+        step of every fade is set with `set_duty()`.
+        """
+        await self.set_duty(val)
 
     @abstractmethod
     async def set_hardware_duty(self, val: int):
@@ -113,30 +354,114 @@ class Fadeable(ABC):
     async def get_hardware_duty(self) -> int:
         """Get duty from hardware."""
 
-    async def _fade(self, duty: int, duration: float):
-        constrained_duty = self._constrain(duty)
-        current = await self.get_duty()
-        if constrained_duty == current:
-            return
-        step = 1 if current < constrained_duty else -1
-        steps = abs(current - constrained_duty)
-        freq = steps / duration
-        while freq > self.max_fade_freq_hz:
-            steps //= 2
-            step *= 2
-            freq = steps / duration
-
-        delay = 1 / freq
-
-        for br in range(current, constrained_duty + step, step):
-            start = monotonic()
-            br = max(br, 0)
-            br = min(br, self.max_duty)
-            await self.set_duty(br)
-            elapsed = monotonic() - start
-            await asyncio.sleep(max(0, delay - elapsed))
-        # duty may be less than min duty; permit turning off.
-        await self.set_duty(duty)
+    def plan_fade(
+        self, duty: int, duration: float, table: array, current: int, start: float
+    ) -> FadePlan:
+        """Plan a fade from `current` to `duty` along `table`, starting at `start`."""
+        origin = position(table, current)
+        span = position(table, self._constrain(duty)) - origin
+        # There's no point in running more frames than there are table entries.
+        frame_s = max(1 / self.max_fade_freq_hz, duration / (abs(span) or 1))
+        return FadePlan(table, origin, span, start, duration, duty, frame_s)
+
+    async def _fade(self, duty: int, duration: float, table: array) -> float:
+        """Fade to `duty` along `table`, finishing `duration` seconds from now.
+
+        Each frame's duty is calculated from elapsed time against a fixed deadline, so
+        slow hardware writes cause frames to be skipped rather than stretching the fade.
+        The plan is re-read every frame, so it may be changed under a running fade.
+        """
+        start = monotonic()
+        last = await self.get_duty()
+        self._plan = plan = self.plan_fade(duty, duration, table, last, start)
+        self._retargeted.clear()
+        retries, resets = self.hardware_retries, self.hardware_resets
+        writes: list[float] = []
+        lateness: list[float] = []
+        cancelled = True
+        try:
+            while True:
+                while (plan := self._plan).span and (
+                    now := monotonic()
+                ) < plan.deadline:
+                    br = plan.duty_at(now)
+                    if br != last:
+                        await self.set_fade_duty(br)
+                        writes.append(monotonic())
+                        last = br
+                    late = await self._wait_frame(plan.next_frame(monotonic()))
+                    if late is not None:
+                        lateness.append(late)
+                # duty may be less than min duty; permit turning off.
+                await self.set_duty(plan.duty)
+                writes.append(monotonic())
+                last = plan.duty
+                if self._plan is plan:
+                    break
+                # Retargeted during the final write; carry on to the new target.
+            cancelled = False
+        finally:
+            if self._fade_task is asyncio.current_task():
+                # Otherwise the fade has already been superseded.
+                self._plan = None
+            stats = self.record_fade(
+                plan, start, writes, lateness, retries, resets, cancelled
+            )
+        self._logger.debug(
+            f"Faded to {plan.duty}, overrunning by {stats.overrun_s:.3f}s.",
+            steps=stats.steps,
+            retries=stats.retries,
+        )
+        return stats.overrun_s
+
+    def record_fade(
+        self,
+        plan: FadePlan,
+        start: float,
+        writes: list[float],
+        lateness: list[float],
+        retries: int,
+        resets: int,
+        cancelled: bool,
+    ) -> FadeStats:
+        """Record how a fade along `plan` went in `fade_history`.
+
+        `writes` are the times of each write, `lateness` how late each frame woke,
+        and `retries` and `resets` the hardware counts when it started.
+        """
+        end = monotonic()
+        intervals = [b - a for a, b in zip(writes, writes[1:])]
+        stats = FadeStats(
+            duty=plan.duty,
+            duration=plan.duration,
+            steps=len(writes),
+            interval_p50_s=_percentile(intervals, 50),
+            interval_p99_s=_percentile(intervals, 99),
+            late_p99_s=_percentile(lateness, 99),
+            retries=self.hardware_retries - retries,
+            resets=self.hardware_resets - resets,
+            total_s=end - start,
+            overrun_s=max(0.0, end - plan.deadline),
+            cancelled=cancelled,
+        )
+        self.fade_history.append(stats)
+        return stats
+
+    async def _wait_frame(self, delay: float) -> Optional[float]:
+        """Wait `delay` for the next frame, waking early if the fade is retargeted.
+
+        Returns how late the wait ended, if it was timed.
+        """
+        if await yield_if_short(delay):
+            return None
+        due = monotonic() + delay
+        try:
+            async with asyncio.timeout(delay):
+                await self._retargeted.wait()
+        except TimeoutError:
+            return max(0.0, monotonic() - due)
+        self._retargeted.clear()
+        return None
 
     async def get_percent_duty(self) -> float:
         """Get current duty as a percentage."""
@@ -166,6 +491,7 @@ class MockFadeable(Fadeable):
         # Generally when mocking we don't want anything funny happening with fading.
         kwargs["max_fade_freq_hz"] = kwargs.get("max_fade_freq_hz", 1_000_000_000)
         kwargs["max_duty"] = kwargs.get("max_duty", 100)
+        kwargs["shadow"] = kwargs.get("shadow", False)
         super().__init__(*args, **kwargs)
         self.set_duty_mock = AsyncMock()  # replace as set_duty called in `__init__()`.
 
@@ -179,18 +505,21 @@ class MockFadeable(Fadeable):
         return await self.get_duty_mock()
 
 
-def default_cache_dir() -> Path:
-    return xdg_cache_home() / "rpi_clock"
-
-
 class CachingFadeable(Fadeable):
     """A fadeable which caches runtime-settable values between runs if possible."""
 
-    def __init__(self, *args, cache_dir: Path | None = None, **kwargs):
+    def __init__(
+        self,
+        *args,
+        cache_dir: Path | None = None,
+        store: SettingsStore | None = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         cache_dir = cache_dir or default_cache_dir()
-        cache_dir.mkdir(exist_ok=True, parents=True)
-        self.cachef = cache_dir / f"{self.name}.json"
+        self.store = store or shared_store(cache_dir)
+        if self.name not in self.store:
+            self._migrate_cache(cache_dir / f"{self.name}.json")
         cache = self.load_cache()
 
         for key in {"min_duty", "max_duty"}:
@@ -199,22 +528,26 @@ class CachingFadeable(Fadeable):
             except Exception:
                 self._logger.exception("Failed to set %s", key)
 
-    def load_cache(self) -> dict:
+    def _migrate_cache(self, cachef: Path):
+        """Import settings from the old per-fadeable cache file, if any."""
         try:
-            with self.cachef.open() as f:
-                return load(f)
+            with cachef.open() as f:
+                cache = load(f)
+        except FileNotFoundError:
+            return
         except Exception:
-            self._logger.exception("Failed to load cache")
-            return {}
+            self._logger.exception("Failed to load old cache")
+            return
+        for key, val in cache.items():
+            self.store.set(self.name, key, val)
+        self.store.flush()
+        cachef.unlink()
 
-    def save_cache(self, cache: dict):
-        with self.cachef.open("w") as f:
-            dump(cache, f)
+    def load_cache(self) -> dict:
+        return self.store.section(self.name)
 
     def set_cache(self, key, val):
-        cache = self.load_cache()
-        cache[key] = val
-        self.save_cache(cache)
+        self.store.set(self.name, key, val)
 
     def set_max_duty(self, *args, **kwargs):
         super().set_max_duty(*args, **kwargs)
@@ -274,9 +607,15 @@ class Lamp(CachingFadeable):
         baud: int = 10_000,
         mode: int = 1,
         pin_factory: Factory | None = None,
+        stream_checkpoint: int | None = None,
         **kwargs,
     ):
-        """Initialise a new `Lamp` object."""
+        """Initialise a new `Lamp` object.
+
+        If `stream_checkpoint` is set, fade steps are streamed to the controller
+        without waiting for readback, which is only checked every `stream_checkpoint`
+        steps.
+        """
         # This is bad, but the suggested 'better' alternative is to call a
         # classmethod which *mututes the class state* with the result of this
         # call, and then look up the resulting attribute. No comment.
@@ -291,11 +630,15 @@ class Lamp(CachingFadeable):
         except SPIFixedRate:
             rate_error = "Unable to set spi baud rate: implementation is fixed-rate."
         self.spi: SPI = spi
+        # All spi traffic goes through this thread, so it never blocks the loop.
+        self.hardware = HardwareExecutor(f"spi-{cs}")
         self.cs = NativeFactory().pin(cs)
         self.cs.function = "output"
         self.cs.state = 1
         kwargs["max_duty"] = kwargs.get("max_duty", 1023)
         self._hardware_lock = asyncio.Lock()
+        self.stream_checkpoint = stream_checkpoint
+        self._streamed = 0
         super().__init__(*args, **kwargs)
         if rate_error:
             self._logger.error(rate_error)
@@ -307,20 +650,24 @@ class Lamp(CachingFadeable):
         """
         return bytes(self.spi.transfer(data + b"#")[:-1])
 
-    async def get_duty(self):
-        """Get the current duty."""
-        return self._duty
+    def spi_query(self, data: bytes) -> bytes:
+        """Send a command, wait for the controller to settle and read its response.
+
+        This blocks, so should only be run on the hardware thread.
+        """
+        self.spi_cmd(data)
+        sleep(self.SETTLE_TIME_S)
+        return self.spi_cmd(b" " * 4)
 
     async def get_hardware_duty(self):
         """Get the current duty directly from the controller."""
         async with self._hardware_lock:
-            self.spi_cmd(b"r")
-            sleep(self.SETTLE_TIME_S)
-            return int(self.spi_cmd(b" " * 4))
+            return int(await self.hardware.run("get", self.spi_query, b"r"))
 
     async def reset(self):
         """Reset the controller."""
         self._logger.debug("Resetting")
+        self.hardware_resets += 1
         self.cs.state = 0
         await asyncio.sleep(3)
         self.cs.state = 1
@@ -328,10 +675,10 @@ class Lamp(CachingFadeable):
     async def set_hardware_duty(self, val: int):
         """Set the controller to a given duty, retrying as required."""
         for attempt in range(self.SPI_ATTEMPTS):
+            if attempt:
+                self.hardware_retries += 1
             async with self._hardware_lock:
-                self.spi_cmd(f"s{val}".encode())
-                await asyncio.sleep(self.SETTLE_TIME_S)
-                raw = self.spi_cmd(b" " * 4)
+                raw = await self.hardware.run("set", self.spi_query, f"s{val}".encode())
                 try:
                     resp = int(raw)
                     if resp != val:
@@ -350,6 +697,32 @@ class Lamp(CachingFadeable):
                     await self.reset()
         raise SpiControllerError(f"Failed to set lamp to {val}")
 
+    async def set_fade_duty(self, val: int):
+        """Stream a fade step to the controller, verifying only at checkpoints.
+
+        A mismatch at a checkpoint is resynced by setting the duty with retries.
+        """
+        if not self.stream_checkpoint:
+            return await super().set_fade_duty(val)
+        val = max(self._ceil(val), 0)
+        self._streamed += 1
+        checkpoint = not self._streamed % self.stream_checkpoint
+        cmd = f"s{val}".encode()
+        async with self._hardware_lock:
+            if checkpoint:
+                raw = await self.hardware.run("checkpoint", self.spi_query, cmd)
+            else:
+                await self.hardware.run("stream", self.spi_cmd, cmd)
+        if checkpoint:
+            try:
+                resp = int(raw)
+            except ValueError:
+                resp = None
+            if resp != val:
+                self._logger.debug(f"Resyncing: got {resp} for {val} ({raw!r})")
+                await self.set_hardware_duty(val)
+        self._update_shadow(val)
+
 
 class FadeableEndpoint(Endpoint[CachingFadeable]):
     """An endpoint for a Fadeable."""
@@ -361,13 +734,17 @@ class FadeableEndpoint(Endpoint[CachingFadeable]):
         self.router.put("/")(self.set_duty)
         self.router.get("/raw-duty")(self.get_raw_duty)
         self.router.put("/fade")(self.start_fade)
+        self.router.patch("/fade")(self.retarget_fade)
         self.router.delete("/fade")(self.cancel_fade)
+        self.router.get("/fade/history")(self.get_fade_history)
         self.router.get("/min-duty")(self.get_min_duty)
         self.router.put("/min-duty")(self.set_min_duty)
         self.router.delete("/min-duty")(lambda: self.thing.set_min_duty(None))
         self.router.get("/max-duty")(self.get_max_duty)
         self.router.put("/max-duty")(self.set_max_duty)
         self.router.delete("/max-duty")(lambda: self.thing.set_max_duty(None))
+        if isinstance(self.thing, Lamp):
+            self.router.get("/hardware")(self.get_hardware_latency)
 
     def get_min_duty(self):
         """Get min duty."""
@@ -404,14 +781,39 @@ class FadeableEndpoint(Endpoint[CachingFadeable]):
         self,
         duty: float,
         duration: Optional[float] = None,
+        curve: Optional[Curve] = None,
     ):
         """Start fade."""
-        kwargs = dict(percent_duty=duty, duration=duration)
-        kwargs = {k: v for k, v in kwargs.items() if v is not None}
-        asyncio.create_task(self.thing.fade(**kwargs))
+        asyncio.create_task(
+            self.thing.fade(
+                percent_duty=duty,
+                duration=1 if duration is None else duration,
+                curve=curve or "linear",
+            )
+        )
+        return {"state": "success"}
+
+    async def retarget_fade(
+        self,
+        duty: float,
+        duration: Optional[float] = None,
+        curve: Optional[Curve] = None,
+    ):
+        """Retarget running fade, or start one."""
+        asyncio.create_task(
+            self.thing.retarget(percent_duty=duty, duration=duration, curve=curve)
+        )
         return {"state": "success"}
 
     async def cancel_fade(self):
         """Cancel fade."""
         self.thing.cancel_fade()
         return {"state": "success"}
+
+    def get_fade_history(self) -> list[FadeStats]:
+        """Get stats for recent fades, oldest first."""
+        return list(self.thing.fade_history)
+
+    def get_hardware_latency(self) -> dict[str, dict[str, float]]:
+        """Get hardware command latency, by command."""
+        return cast(Lamp, self.thing).hardware.summary()
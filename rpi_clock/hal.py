@@ -7,7 +7,7 @@ from .lcd import Lcd
 
 backlight = PWM(pinmap.BACKLIGHT_CHANNEL, name="backlight")
 lcd = Lcd(backlight=backlight)
-lamp = Lamp(name="lamp")
+lamp = Lamp(name="lamp", stream_checkpoint=16, reconcile_s=60)
 
 volume = PWM(pinmap.VOLUME_CHANNEL, name="backlight")
 mute = LED(pinmap.MUTE_PIN, active_high=False)
@@ -2,7 +2,7 @@ import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
-from . import clock, hal
+from . import clock, hal, mopidy, store
 
 
 @asynccontextmanager
@@ -15,6 +15,12 @@ async def setup_hardware(_) -> AsyncIterator[None]:
     # acquiring the native gpio pin for reset breaks something in the kernel lcd driver.
     # resetting here fixes it.
     hal.lcd.restart()
+    mopidy.session.start()
+    mopidy.mopidy_volume.start_reconciling()
     asyncio.get_event_loop().create_task(clock.run())
 
     yield
+
+    hal.lamp.hardware.shutdown()
+    await mopidy.session.close()
+    store.flush_all()
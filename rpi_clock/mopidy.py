@@ -1,56 +1,331 @@
+import asyncio
+from time import monotonic
+from typing import Awaitable, Callable, Optional, TypeVar
+
 from mopidy_asyncio_client import MopidyClient
+from structlog import get_logger
 
 from .fadeable import Fadeable
 
+logger = get_logger()
+
+T = TypeVar("T")
+
+
+class MopidySession:
+    """A long-lived connection to mopidy, shared by everything which talks to it.
+
+    Failed calls reconnect with exponential backoff, and a background health check
+    drops dead connections so the next call starts from a fresh one.
+    """
+
+    ATTEMPTS = 4
+    MIN_BACKOFF_S = 0.5
+    MAX_BACKOFF_S = 8
+    HEALTH_CHECK_S = 60
+    HEALTH_TIMEOUT_S = 5
+
+    def __init__(self, host: str = "localhost", port: int = 6680):
+        """Initialise a new session.  No connection is made until one is needed."""
+        self.host = host
+        self.port = port
+        self._client: Optional[MopidyClient] = None
+        self._bindings: list[tuple[str, Callable]] = []
+        self.connections = 0
+        self._connect_lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+        self._healthy = True
+        self._logger = logger.bind(name=f"mopidy-{host}")
+
+    @property
+    def connected(self) -> bool:
+        """Whether the session currently holds an open connection."""
+        return bool(self._client and self._client.is_connected())
+
+    async def connect(self) -> MopidyClient:
+        """Get a connected client, connecting if required."""
+        async with self._connect_lock:
+            if not self.connected:
+                if self._client:
+                    await self._client.disconnect()
+                # Let failures surface here, where we control the backoff.
+                self._client = MopidyClient(
+                    host=self.host, port=self.port, reconnect_attempts=1
+                )
+                await self._client.connect()
+                for event, callback in self._bindings:
+                    self._client.bind(event, callback)
+                self.connections += 1
+                self._logger.debug("Connected")
+            return self._client
+
+    def bind(self, event: str, callback: Callable[[dict], Awaitable]):
+        """Call `callback` on a mopidy event, across reconnections."""
+        self._bindings.append((event, callback))
+        if self._client:
+            self._client.bind(event, callback)
+
+    async def disconnect(self):
+        """Drop the current connection, if any."""
+        if self._client:
+            client, self._client = self._client, None
+            await client.disconnect()
+
+    async def call(
+        self,
+        fn: Callable[[MopidyClient], Awaitable[T]],
+        attempts: Optional[int] = None,
+    ) -> T:
+        """Call `fn` with a connected client, reconnecting with backoff on failure."""
+        attempts = attempts or self.ATTEMPTS
+        delay = self.MIN_BACKOFF_S
+        for _ in range(attempts - 1):
+            try:
+                return await fn(await self.connect())
+            except Exception:
+                self._logger.exception(f"Mopidy call failed; retrying in {delay}s")
+                await self.disconnect()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_BACKOFF_S)
+        return await fn(await self.connect())
+
+    async def check_health(self) -> bool:
+        """Check the connection responds, dropping it if not.
+
+        Only the first failure of an outage is logged as a warning.
+        """
+        try:
+            client = await self.connect()
+            await asyncio.wait_for(client.core.get_version(), self.HEALTH_TIMEOUT_S)
+        except Exception as e:
+            if self._healthy:
+                self._logger.warning(f"Lost connection: {e!r}")
+            else:
+                self._logger.debug(f"Health check failed: {e!r}")
+            self._healthy = False
+            await self.disconnect()
+            return False
+        if not self._healthy:
+            self._logger.info("Connection recovered")
+            self._healthy = True
+        return True
+
+    async def warm(self) -> bool:
+        """Make sure a healthy connection is ready before it is needed."""
+        if await self.check_health():
+            return True
+        # check_health() dropped the connection; try a fresh one.
+        return await self.check_health()
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.HEALTH_CHECK_S)
+
+    def start(self):
+        """Start checking the connection in the background."""
+        if not self._health_task:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        """Stop health checks and disconnect."""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        await self.disconnect()
+
 
 class MopidyVolume(Fadeable):
     """A volume, fadeable up and down."""
 
-    def __init__(self, *args, host="localhost", **kwargs):
+    def __init__(self, *args, session: MopidySession, **kwargs):
         """Initialise a `MopidyVolume` object."""
-        self.client = MopidyClient(host=host)
+        self.session = session
         self.max_duty = 100
         super().__init__(*args, **kwargs)
 
     async def get_hardware_duty(self):
         """Get volume duty."""
-        async with self.client as mopidy:
-            return await mopidy.mixer.get_volume()
+        return await self.session.call(lambda mopidy: mopidy.mixer.get_volume())
 
     async def set_hardware_duty(self, val: int):
         """Set volume duty."""
-        async with self.client as mopidy:
-            await mopidy.mixer.set_volume(val)
+        await self.session.call(lambda mopidy: mopidy.mixer.set_volume(val))
+
+
+class PlaylistIndex:
+    """Playlists by name, and their tracks, cached between uses.
 
+    The cache is dropped on mopidy's playlist events, and on reconnecting, since
+    events may have been missed whilst disconnected.  `TTL_S` bounds its age in
+    case events are never delivered at all.
+    """
 
-async def queue_playlist(mopidy, name: str):
-    """Queue a given playlist by name."""
-    playlists = await mopidy.playlists.as_list()
-    assert playlists
-    playlist = next(x["uri"] for x in playlists if x["name"] == name)
-    tracks = await mopidy.playlists.lookup(playlist)
-    await mopidy.tracklist.add(uris=[x["uri"] for x in tracks["tracks"]])
+    TTL_S = 3600
+    EVENTS = ("playlist_changed", "playlist_deleted", "playlists_loaded")
+
+    def __init__(self, session: MopidySession):
+        """Initialise a new index of the playlists available to `session`."""
+        self.session = session
+        self._uris: dict[str, str] = {}
+        self._tracks: dict[str, list[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._connection = 0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._logger = logger.bind(name="playlists")
+        for event in self.EVENTS:
+            session.bind(event, self._on_event)
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the cached index can be trusted."""
+        return (
+            self._loaded_at is not None
+            and self.session.connected
+            and self._connection == self.session.connections
+            and monotonic() - self._loaded_at < self.TTL_S
+        )
+
+    def invalidate(self):
+        """Drop the cached index."""
+        self._generation += 1
+        self._loaded_at = None
+
+    async def _on_event(self, _):
+        self._logger.debug("Playlists changed.")
+        self.invalidate()
+
+    async def _refresh(self):
+        async with self._lock:
+            if self.fresh:
+                self.hits += 1
+                return
+            self.misses += 1
+            generation = self._generation
+            playlists = await self.session.call(
+                lambda mopidy: mopidy.playlists.as_list()
+            )
+            self._uris = {x["name"]: x["uri"] for x in playlists or []}
+            self._tracks = {}
+            if generation == self._generation:
+                # Otherwise it changed whilst loading; load again next time.
+                self._loaded_at = monotonic()
+                self._connection = self.session.connections
+
+    async def names(self) -> list[str]:
+        """Get the names of every playlist."""
+        await self._refresh()
+        return list(self._uris)
+
+    async def uri(self, name: str) -> str:
+        """Get the uri of a playlist by name."""
+        await self._refresh()
+        try:
+            return self._uris[name]
+        except KeyError:
+            raise KeyError(f"No playlist {name}") from None
+
+    async def tracks(self, name: str) -> list[str]:
+        """Get the track uris of a playlist by name."""
+        uri = await self.uri(name)
+        if uri not in self._tracks:
+            playlist = await self.session.call(
+                lambda mopidy: mopidy.playlists.lookup(uri)
+            )
+            self._tracks[uri] = [x["uri"] for x in playlist["tracks"]]
+        return self._tracks[uri]
+
+
+class AlarmPlayer:
+    """Playback of a shuffled playlist, which can be queued up ahead of time.
+
+    Once prepared, starting playback is a single call; otherwise the playlist is
+    resolved and queued first.  A preparation is only trusted for `PREPARED_TTL_S`,
+    as anything else may have used the tracklist since.  Nothing is prepared whilst
+    something is playing or paused, as queueing replaces the tracklist; it is
+    queued at play time instead.
+    """
+
+    PREPARED_TTL_S = 900
+
+    def __init__(
+        self, session: MopidySession, playlists: PlaylistIndex, playlist: str = "alarm"
+    ):
+        """Initialise a new player of `playlist`."""
+        self.session = session
+        self.playlists = playlists
+        self.playlist = playlist
+        self._prepared_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._logger = logger.bind(name=f"player-{playlist}")
+
+    @property
+    def prepared(self) -> bool:
+        """Whether the playlist is queued ready to play."""
+        return (
+            self._prepared_at is not None
+            and monotonic() - self._prepared_at < self.PREPARED_TTL_S
+        )
+
+    async def _queue(self):
+        uris = await self.playlists.tracks(self.playlist)
+
+        async def queue(mopidy: MopidyClient):
+            await mopidy.tracklist.clear()
+            await mopidy.tracklist.add(uris=uris)
+            await mopidy.tracklist.shuffle()
+
+        await self.session.call(queue)
+
+    async def prepare(self) -> bool:
+        """Connect and queue the playlist, returning whether that succeeded."""
+        async with self._lock:
+            self._prepared_at = None
+            try:
+                await self.session.warm()
+                state = await self.session.call(
+                    lambda mopidy: mopidy.playback.get_state()
+                )
+                if state in {"playing", "paused"}:
+                    self._logger.info(f"Playback {state}; queueing at play time.")
+                    return False
+                await self._queue()
+            except Exception:
+                self._logger.exception("Failed to prepare playback")
+                return False
+            self._prepared_at = monotonic()
+            self._logger.debug("Prepared")
+            return True
+
+    async def play(self):
+        """Start playback, queueing the playlist first unless prepared."""
+        async with self._lock:
+            if not self.prepared:
+                self._logger.info("Not prepared; queueing now.")
+                await self._queue()
+            self._prepared_at = None
+            await self.session.call(lambda mopidy: mopidy.playback.play())
 
 
 async def play():
     """Start playback."""
-    ATTEMPTS = 4
-    for _ in range(ATTEMPTS):
-        try:
-            async with MopidyClient(host="localhost") as mopidy:
-                await mopidy.tracklist.clear()
-                await queue_playlist(mopidy, "alarm")
-                await mopidy.tracklist.shuffle()
-                await mopidy.playback.play()
-            break
-        except Exception:
-            continue
+    try:
+        await player.play()
+    except Exception:
+        logger.exception("Failed to start playback")
 
 
 async def stop():
     """Stop playback."""
-    async with MopidyClient(host="localhost") as mopidy:
-        await mopidy.playback.stop()
+    await session.call(lambda mopidy: mopidy.playback.stop())
 
 
-mopidy_volume = MopidyVolume(host="localhost", max_fade_freq_hz=4)
+session = MopidySession(host="localhost")
+playlists = PlaylistIndex(session)
+player = AlarmPlayer(session, playlists)
+mopidy_volume = MopidyVolume(
+    session=session, max_fade_freq_hz=4, coalesce=True, reconcile_s=30
+)
@@ -0,0 +1,113 @@
+"""When alarms repeat."""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+DAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+EVERY_DAY = 0b1111111
+WEEKDAYS = 0b0011111
+
+
+@dataclass
+class Recurrence:
+    """When an alarm repeats.
+
+    `weekdays` is a mask of the days it repeats on, with Monday as bit 0.  It also
+    elapses on any one-off `dates`, never after `until`, and not on `skip`.
+    """
+
+    weekdays: int = EVERY_DAY
+    dates: set[date] = field(default_factory=set)
+    until: Optional[date] = None
+    skip: Optional[date] = None
+
+    @classmethod
+    def from_rrule(cls, rule: str) -> "Recurrence":
+        """Parse the supported subset of an RFC 5545 RRULE.
+
+        That is, FREQ=DAILY or FREQ=WEEKLY, with optional BYDAY and UNTIL.
+        """
+        try:
+            parts = dict(
+                x.split("=", 1)
+                for x in rule.upper().removeprefix("RRULE:").split(";")
+                if x
+            )
+        except ValueError:
+            raise ValueError(f"Invalid rrule {rule}") from None
+        freq = parts.pop("FREQ", None)
+        if freq not in {"DAILY", "WEEKLY"}:
+            raise ValueError(f"Unsupported rrule frequency {freq}")
+        weekdays = EVERY_DAY
+        if byday := parts.pop("BYDAY", None):
+            try:
+                weekdays = sum(1 << DAYS.index(x) for x in set(byday.split(",")))
+            except ValueError:
+                raise ValueError(f"Invalid rrule days {byday}") from None
+        elif freq == "WEEKLY":
+            raise ValueError("Weekly rrules must give BYDAY")
+        until = None
+        if raw_until := parts.pop("UNTIL", None):
+            until = datetime.strptime(raw_until[:8], "%Y%m%d").date()
+        if parts:
+            raise ValueError(f"Unsupported rrule parts {', '.join(parts)}")
+        return cls(weekdays=weekdays, until=until)
+
+    def to_rrule(self) -> Optional[str]:
+        """Get the repeating part as an RRULE, if it repeats."""
+        if not self.weekdays:
+            return None
+        if self.weekdays == EVERY_DAY:
+            rule = "FREQ=DAILY"
+        else:
+            days = ",".join(x for i, x in enumerate(DAYS) if self.weekdays >> i & 1)
+            rule = f"FREQ=WEEKLY;BYDAY={days}"
+        if self.until:
+            rule += f";UNTIL={self.until:%Y%m%d}"
+        return rule
+
+    def to_json(self) -> dict:
+        """Get a json-serialisable representation."""
+        return {
+            "weekdays": self.weekdays,
+            "dates": sorted(str(x) for x in self.dates),
+            "until": str(self.until) if self.until else None,
+            "skip": str(self.skip) if self.skip else None,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Recurrence":
+        """Load from the output of `to_json()`."""
+        until, skip = data.get("until"), data.get("skip")
+        return cls(
+            weekdays=data.get("weekdays", EVERY_DAY),
+            dates={date.fromisoformat(x) for x in data.get("dates", [])},
+            until=date.fromisoformat(until) if until else None,
+            skip=date.fromisoformat(skip) if skip else None,
+        )
+
+    def next_elapse(self, at: time, after: datetime) -> Optional[datetime]:
+        """Get the first elapse at time `at` no earlier than `after`, if any."""
+        candidates = []
+        if self.weekdays:
+            # The pattern repeats weekly, so even past a skipped day two weeks is
+            # as far ahead as we need look.
+            for offset in range(15):
+                day = after.date() + timedelta(days=offset)
+                if self.until and day > self.until:
+                    break
+                elapse = datetime.combine(day, at)
+                if (
+                    elapse >= after
+                    and day != self.skip
+                    and self.weekdays >> day.weekday() & 1
+                ):
+                    candidates.append(elapse)
+                    break
+        candidates.extend(
+            elapse
+            for day in self.dates
+            if (elapse := datetime.combine(day, at)) >= after and day != self.skip
+        )
+        return min(candidates, default=None)
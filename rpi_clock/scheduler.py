@@ -0,0 +1,106 @@
+"""A shared scheduler sleeping until wall-clock deadlines."""
+
+import asyncio
+import heapq
+from datetime import datetime
+from itertools import count
+from time import monotonic, time
+from typing import Optional
+
+from structlog import get_logger
+
+logger = get_logger()
+
+
+class Scheduler:
+    """Sleep until wall-clock deadlines, with one wakeup shared by every waiter.
+
+    Waiters are kept in a min-heap by deadline, and the scheduler sleeps until the
+    nearest, re-arming whenever an earlier deadline is added.  Sleeps run on the
+    monotonic clock, so each is capped at `MAX_SLEEP_S`; on waking, the wall clock is
+    compared with monotonic time to notice jumps (ntp steps, resume from suspend),
+    and every deadline is checked against the new time.
+
+    A scheduler serves one event loop at a time.
+    """
+
+    MAX_SLEEP_S = 60
+    JUMP_TOLERANCE_S = 1
+
+    def __init__(self, name: str = "scheduler"):
+        """Initialise a new scheduler.  It starts when first waited on."""
+        self.name = name
+        self._logger = logger.bind(name=name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heap: list[tuple[datetime, int, asyncio.Future]] = []
+        self._seq = count()
+        self._rearm = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.wakeups = 0
+        self.jumps = 0
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._heap = []
+            self._rearm = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    @property
+    def next_deadline(self) -> Optional[datetime]:
+        """Get the nearest deadline anything is waiting for."""
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    async def sleep_until(self, deadline: datetime):
+        """Sleep until the wall clock reaches `deadline`."""
+        if datetime.now() >= deadline:
+            return
+        self._ensure_running()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (deadline, next(self._seq), waiter))
+        if self._heap[0][2] is waiter:
+            self._rearm.set()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Don't wake for a deadline nobody is waiting on.
+            self._rearm.set()
+            raise
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].done():
+            heapq.heappop(self._heap)
+
+    def _elapse(self):
+        """Wake everything whose deadline has passed."""
+        now = datetime.now()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, waiter = heapq.heappop(self._heap)
+            if not waiter.done():
+                waiter.set_result(None)
+        self._drop_cancelled()
+
+    async def _run(self):
+        while True:
+            self._elapse()
+            delay = None
+            if self._heap:
+                delay = (self._heap[0][0] - datetime.now()).total_seconds()
+                delay = min(max(delay, 0), self.MAX_SLEEP_S)
+            wall, mono = time(), monotonic()
+            try:
+                async with asyncio.timeout(delay):
+                    await self._rearm.wait()
+            except TimeoutError:
+                pass
+            self._rearm.clear()
+            self.wakeups += 1
+            jump = (time() - wall) - (monotonic() - mono)
+            if abs(jump) > self.JUMP_TOLERANCE_S:
+                self.jumps += 1
+                self._logger.warning(f"Wall clock jumped by {jump:.1f}s; rescheduling.")
+
+
+scheduler = Scheduler()
@@ -0,0 +1,175 @@
+"""Persistent settings, held in memory and written behind to disk."""
+
+import asyncio
+import os
+from json import dumps, load
+from pathlib import Path
+from threading import Lock
+from typing import Any, Optional
+
+from structlog import get_logger
+from xdg_base_dirs import xdg_cache_home
+
+logger = get_logger()
+
+
+def default_cache_dir() -> Path:
+    return xdg_cache_home() / "rpi_clock"
+
+
+class SettingsStore:
+    """A json file of settings, in sections, shared by everything needing to persist.
+
+    The in-memory copy is authoritative: reads never touch the disk, and changes are
+    written behind after `debounce_s`, in a thread, so a burst of changes costs a
+    single write and the event loop never waits on the sd card.  Writes go to a
+    temporary file which is then renamed over the original, keeping the previous
+    file as a backup, so a power cut leaves a good copy to load from.
+    """
+
+    DEBOUNCE_S = 2
+
+    def __init__(self, path: Path, debounce_s: Optional[float] = None):
+        """Initialise a new store, loading any existing settings."""
+        self.path = path
+        self.debounce_s = self.DEBOUNCE_S if debounce_s is None else debounce_s
+        self._logger = logger.bind(name=path.name)
+        self._data: dict[str, dict[str, Any]] = self._load()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._write_lock = Lock()
+        self._generation = 0
+        self._written = 0
+        self.dirty = False
+
+    @property
+    def backup(self) -> Path:
+        """Get the path of the previous settings file."""
+        return self.path.with_suffix(".bak")
+
+    def _load(self) -> dict:
+        for path in (self.path, self.backup):
+            try:
+                with path.open() as f:
+                    data = load(f)
+                if path == self.backup:
+                    self._logger.warning("Recovered settings from backup")
+                return data
+            except FileNotFoundError:
+                continue
+            except Exception:
+                self._logger.exception(f"Failed to load settings from {path}")
+        return {}
+
+    def __contains__(self, section: str) -> bool:
+        return section in self._data
+
+    def section(self, section: str) -> dict[str, Any]:
+        """Get a copy of all settings in `section`."""
+        return dict(self._data.get(section, {}))
+
+    def get(self, section: str, key: str, default: Any = None) -> Any:
+        """Get a setting."""
+        return self._data.get(section, {}).get(key, default)
+
+    def set(self, section: str, key: str, val: Any):
+        """Set a setting, scheduling a write if it changed."""
+        values = self._data.setdefault(section, {})
+        if key in values and values[key] == val:
+            return
+        values[key] = val
+        self._changed()
+
+    def remove(self, section: str, key: str):
+        """Remove a setting, scheduling a write if it existed."""
+        values = self._data.get(section, {})
+        if key not in values:
+            return
+        del values[key]
+        if not values:
+            del self._data[section]
+        self._changed()
+
+    def _changed(self):
+        self.dirty = True
+        self._generation += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing to write behind with: write now.
+            self.flush()
+            return
+        if not self._flush_handle:
+            self._flush_handle = loop.call_later(self.debounce_s, self._write_behind)
+
+    def _write_behind(self):
+        self._flush_handle = None
+        if not self._writer or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self):
+        # Changes made whilst writing are picked up by the next pass.
+        while self.dirty:
+            self.dirty = False
+            snapshot = self._generation, dumps(self._data)
+            try:
+                await asyncio.to_thread(self._write, *snapshot)
+            except Exception:
+                self.dirty = True
+                self._logger.exception("Failed to save settings")
+                return
+
+    def _write(self, generation: int, data: str):
+        with self._write_lock:
+            if generation <= self._written:
+                # A newer snapshot got there first.
+                return
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.path.exists():
+                os.replace(self.path, self.backup)
+            os.replace(tmp, self.path)
+            fd = os.open(self.path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._written = generation
+
+    def flush(self):
+        """Write any changes to disk now, blocking until written."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            self._write(self._generation, dumps(self._data))
+        except Exception:
+            self.dirty = True
+            self._logger.exception("Failed to save settings")
+
+
+_stores: dict[Path, SettingsStore] = {}
+
+
+def shared_store(cache_dir: Optional[Path] = None) -> SettingsStore:
+    """Get the store shared by everything caching settings in `cache_dir`."""
+    path = (cache_dir or default_cache_dir()) / "settings.json"
+    if path not in _stores:
+        _stores[path] = SettingsStore(path)
+    return _stores[path]
+
+
+def flush_all():
+    """Write any pending changes in shared stores to disk."""
+    for store in _stores.values():
+        store.flush()
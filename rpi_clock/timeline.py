@@ -0,0 +1,187 @@
+"""Several fades driven together from one shared tick."""
+
+import asyncio
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Optional
+
+from structlog import get_logger
+
+from .curves import Curve, lut
+from .fadeable import Fadeable, FadePlan, yield_if_short
+
+logger = get_logger()
+
+
+@dataclass(eq=False)
+class Track:
+    """A fade of one output, starting `offset` seconds into a timeline."""
+
+    fadeable: Fadeable
+    duty: Optional[int] = None
+    percent_duty: Optional[float] = None
+    duration: float = 1
+    offset: float = 0
+    curve: Curve = "linear"
+
+    def __post_init__(self):
+        if self.duty is None and self.percent_duty is None:
+            raise ValueError("One of percent_duty or duty must be supplied.")
+
+
+@dataclass(eq=False)
+class _TrackRun:
+    """The progress of a track through one run of its timeline."""
+
+    track: Track
+    plan: Optional[FadePlan] = None
+    fade: Optional[asyncio.Future[float]] = None
+    last: Optional[int] = None
+    due: float = 0
+    write: Optional[asyncio.Task] = None
+    done: bool = False
+    started: float = 0
+    writes: list[float] = field(default_factory=list)
+    lateness: list[float] = field(default_factory=list)
+    retries: int = 0
+    resets: int = 0
+
+
+class Timeline:
+    """A group of fades driven from a single tick, and cancelled as a unit.
+
+    Each tick writes every track which has a frame due, without waiting on tracks
+    whose previous write is still in flight: a slow output skips frames rather than
+    holding the others back.  Each running track is its fadeable's current fade, so
+    it may be retargeted, or cancelled by a new fade, and is recorded in the
+    fadeable's `fade_history` like any other.
+    """
+
+    instances = 0
+
+    def __init__(self, *tracks: Track, name: Optional[str] = None):
+        """Initialise a new timeline of `tracks`."""
+        if not tracks:
+            raise ValueError("A timeline needs at least one track.")
+        self.tracks = tracks
+        self.name = name or f"Timeline-{self.instances}"
+        Timeline.instances += 1
+        self._logger = logger.bind(name=self.name)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the timeline is running."""
+        return bool(self._task and not self._task.done())
+
+    def start(self) -> asyncio.Task:
+        """Start running the timeline in the background."""
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def cancel(self):
+        """Cancel every track of a running timeline."""
+        if self._task:
+            self._task.cancel()
+
+    async def _start_track(self, run: _TrackRun, start: float):
+        track = run.track
+        fadeable = track.fadeable
+        fadeable.cancel_fade()
+        duty = fadeable.target_duty(track.duty, track.percent_duty)
+        table = lut(track.curve, fadeable.min_duty, fadeable.max_duty)
+        run.last = await fadeable.get_duty()
+        run.plan = fadeable.plan_fade(duty, track.duration, table, run.last, start)
+        run.started = monotonic()
+        run.retries = fadeable.hardware_retries
+        run.resets = fadeable.hardware_resets
+        # Own the fadeable like any other fade, so a new fade cancels this track.
+        run.fade = fadeable.claim_fade(run.plan)
+
+    def _tick(self, run: _TrackRun, now: float):
+        """Write the track's frame if one is due, returning when it is next due."""
+        assert run.fade
+        if run.fade.done():
+            # Superseded by another fade.
+            run.done = True
+            return None
+        fadeable = run.track.fadeable
+        # Follow the plan on the fadeable, which may have been retargeted.
+        run.plan = plan = fadeable.plan or run.plan
+        assert plan
+        if run.write and not run.write.done():
+            # Still writing; skip this frame.
+            return now + plan.next_frame(now)
+        if now >= plan.deadline:
+            run.done = True
+            # duty may be less than min duty; permit turning off.
+            run.write = asyncio.create_task(fadeable.set_duty(plan.duty))
+            run.writes.append(now)
+            return None
+        if now >= run.due:
+            if run.due:
+                run.lateness.append(now - run.due)
+            duty = plan.duty_at(now)
+            if duty != run.last:
+                run.write = asyncio.create_task(fadeable.set_fade_duty(duty))
+                run.writes.append(now)
+                run.last = duty
+        run.due = now + plan.next_frame(now)
+        return min(run.due, plan.deadline)
+
+    async def run(self) -> float:
+        """Run every track to completion.
+
+        Returns how far the last track overran its deadline, in seconds.
+        """
+        start = monotonic()
+        runs = [_TrackRun(track) for track in self.tracks]
+        try:
+            while not all(run.done for run in runs):
+                now = monotonic()
+                wake = []
+                for run in runs:
+                    if run.done:
+                        continue
+                    track_start = start + run.track.offset
+                    if now < track_start:
+                        wake.append(track_start)
+                        continue
+                    if not run.plan:
+                        await self._start_track(run, track_start)
+                    if (due := self._tick(run, now)) is not None:
+                        wake.append(due)
+                if wake:
+                    delay = min(wake) - monotonic()
+                    if not await yield_if_short(delay):
+                        await asyncio.sleep(delay)
+            await asyncio.gather(*(x.write for x in runs if x.write))
+        finally:
+            for run in runs:
+                self._finish_track(run)
+        deadline = max(x.plan.deadline for x in runs if x.plan)
+        overrun = max(0.0, monotonic() - deadline)
+        self._logger.debug(f"Finished, overrunning by {overrun:.3f}s.")
+        return overrun
+
+    def _finish_track(self, run: _TrackRun):
+        """Record the track's fade, and hand its fadeable back."""
+        if not run.plan or not run.fade:
+            return
+        fadeable = run.track.fadeable
+        superseded = run.fade.done()
+        written = bool(run.write and run.write.done())
+        if run.write:
+            run.write.cancel()
+        fadeable.record_fade(
+            run.plan,
+            run.started,
+            run.writes,
+            run.lateness,
+            run.retries,
+            run.resets,
+            cancelled=superseded or not (run.done and written),
+        )
+        if not (run.done and written):
+            run.fade.cancel()
+        fadeable.release_fade(run.fade, max(0.0, monotonic() - run.plan.deadline))
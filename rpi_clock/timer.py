@@ -1,18 +1,25 @@
 import asyncio
-from typing import Callable
-
-from . import run
+from typing import Callable, Optional
 
 
 class Timer:
-    """Asyncio timer, api based loosely on Peter Hinch's Delay_ms."""
+    """Asyncio timer, api based loosely on Peter Hinch's Delay_ms.
+
+    Timers are `loop.call_at` handles in the loop's own timer heap, rather than tasks
+    sleeping, so arming one allocates no task.  Re-triggering a timer which is
+    already armed only moves its deadline: the existing handle fires, sees the
+    deadline has moved, and re-arms for the remainder.  A task is only created if
+    `fn` is a coroutine function, and the timer is running until it finishes.
+    """
 
     def __init__(self, duration_ms=1_000, fn: Callable | None = None):
         """Set up the timer."""
-        self.task = None
         self.loop = asyncio.get_event_loop()
         self._duration = duration_ms / 1_000
         self.fn: Callable | None = fn
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._deadline = 0.0
+        self.task: Optional[asyncio.Task] = None
 
     @property
     def duration(self):
@@ -25,27 +32,48 @@ class Timer:
 
     def trigger(self):
         """Cancel and then launch the timer."""
-        self.cancel()
-        self.task = asyncio.create_task(self._trigger())
+        self._cancel_task()
+        loop = asyncio.get_running_loop()
+        self._deadline = loop.time() + self._duration
+        if self._handle:
+            if self._handle.when() <= self._deadline:
+                # It'll re-arm itself when it fires.
+                return
+            self._handle.cancel()
+        self._handle = loop.call_at(self._deadline, self._fire)
 
     def cancel(self):
         """Cancel the timer."""
-        try:
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        self._cancel_task()
+
+    def _cancel_task(self):
+        if self.task:
             self.task.cancel()
             self.task = None
-        except Exception:
-            pass
 
     @property
     def running(self):
         """Whether the timer is currently running."""
-        return bool(self.task)
+        return bool(self._handle or self.task)
 
-    async def _call(self):
-        await run(self.fn)
+    def _fire(self):
+        assert self._handle
+        if self._deadline > self._handle.when():
+            self._handle = asyncio.get_running_loop().call_at(
+                self._deadline, self._fire
+            )
+            return
+        self._handle = None
+        if not self.fn:
+            return
+        x = self.fn()
+        if asyncio.iscoroutine(x):
+            self.task = asyncio.create_task(x)
+            self.task.add_done_callback(self._done)
 
-    async def _trigger(self):
-        await asyncio.sleep(self._duration)
-        if self.fn:
-            await self._call()
-        self.task = None
+    def _done(self, task: asyncio.Task):
+        if self.task is task:
+            self.task = None
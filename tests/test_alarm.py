@@ -5,7 +5,9 @@ from datetime import datetime, time, timedelta
 import pytest
 from helpers import sleep_ms
 
-from rpi_clock.alarm import Alarm, CachingAlarm
+from rpi_clock.alarm import Alarm, Alarms, CachingAlarm, stage
+from rpi_clock.recurrence import Recurrence
+from rpi_clock.store import SettingsStore
 
 
 @pytest.fixture
@@ -63,13 +65,197 @@ async def test_next_elapse(alarm):
     assert alarm.next_elapse == elapse
 
 
-async def test_caching_alarm(tmp_path):
-    alarmf = tmp_path / "alarm.json"
-    alarm = CachingAlarm(dbfile=alarmf)
+async def test_caching_alarm(tmp_path, mocker):
+    store = SettingsStore(tmp_path / "settings.json")
+    alarm = CachingAlarm(callback=mocker.MagicMock(), name="a", store=store)
     assert alarm.target != time(8, 10)
     alarm.target = time(8, 10)
-    assert alarmf.exists()
-    assert json.loads(alarmf.read_text())["value"] == "08:10:00"
-    del alarm
-    alarm = CachingAlarm(dbfile=alarmf)
+    alarm.recurrence = Recurrence(weekdays=0b11)
+    alarm.enabled = False
+    assert store.get("alarms", "a")["target"] == "08:10:00"
+    alarm = CachingAlarm(callback=mocker.MagicMock(), name="a", store=store)
     assert alarm.target == time(8, 10)
+    assert alarm.recurrence == Recurrence(weekdays=0b11)
+    assert not alarm.enabled
+
+
+async def test_caching_alarm_snooze(tmp_path, mocker):
+    store = SettingsStore(tmp_path / "settings.json")
+    alarm = CachingAlarm(callback=mocker.MagicMock(), name="a", store=store)
+    alarm.target = time(8, 10)
+    alarm.snooze(timedelta(minutes=10))
+    await sleep_ms(1)
+    assert store.get("alarms", "a")["target"] == "08:10:00"
+    alarm = CachingAlarm(callback=mocker.MagicMock(), name="a", store=store)
+    await sleep_ms(1)
+    assert alarm.snoozing
+    assert alarm.oneshot
+    remaining = (alarm.next_elapse - datetime.now()).total_seconds()
+    assert remaining == pytest.approx(600, abs=2)
+
+
+async def test_caching_alarm_migrate(tmp_path, mocker):
+    alarmf = tmp_path / "alarm.json"
+    alarmf.write_text(json.dumps({"value": "07:30:00"}))
+    store = SettingsStore(tmp_path / "settings.json")
+    alarm = CachingAlarm(
+        callback=mocker.MagicMock(), name="a", store=store, dbfile=alarmf
+    )
+    assert alarm.target == time(7, 30)
+    assert not alarmf.exists()
+
+
+async def test_caching_alarm_close(tmp_path, mocker):
+    store = SettingsStore(tmp_path / "settings.json")
+    alarms = Alarms(
+        factory=lambda name: CachingAlarm(
+            callback=mocker.MagicMock(), name=name, store=store
+        )
+    )
+    alarms.new("a").target = time(8)
+    assert "a" in store.section("alarms")
+    alarms.remove("a")
+    assert "alarms" not in store
+
+
+async def test_recurrence(alarm):
+    tomorrow = datetime.now() + timedelta(days=1)
+    alarm.recurrence = Recurrence(weekdays=1 << tomorrow.weekday())
+    alarm.target = time(0, 1)
+    await sleep_ms(1)
+    assert alarm.next_elapse == datetime.combine(tomorrow.date(), time(0, 1))
+    after = alarm.skip_next()
+    assert after.date() == tomorrow.date() + timedelta(days=7)
+    await sleep_ms(1)
+    assert alarm.next_elapse == after
+
+
+async def test_no_more_elapses(alarm):
+    alarm.recurrence = Recurrence(weekdays=0)
+    alarm.target = time(8)
+    await sleep_ms(1)
+    assert alarm.state == alarm.OFF
+    assert not alarm.next_elapse
+
+
+async def test_alarms_index(mocker):
+    alarms = Alarms(factory=lambda name: Alarm(name=name, callback=mocker.MagicMock()))
+    watcher = mocker.MagicMock()
+    alarms._next_elapse.callback = watcher
+    now = datetime.now()
+    late = alarms.new("late")
+    late.target = (now - timedelta(hours=2)).time()
+    early = alarms.new("early")
+    early.target = (now - timedelta(hours=3)).time()
+    await sleep_ms(1)
+    assert alarms.next is early
+    assert alarms.next_elapse == early.next_elapse
+    early.enabled = False
+    assert alarms.next is late
+    alarms.remove("late")
+    assert alarms.next_elapse is None
+    assert watcher.call_args.args[1] is None
+    with pytest.raises(ValueError):
+        alarms.add(early)
+
+
+async def test_alarms_index_compacts(mocker):
+    alarms = Alarms(factory=lambda name: Alarm(name=name, callback=mocker.MagicMock()))
+    alarm = alarms.new("a")
+    for hour in range(20):
+        alarm.target = time(hour)
+        await sleep_ms(1)
+    assert len(alarms._heap) <= Alarms.COMPACT_FACTOR
+    assert alarms.next_elapse == alarm.next_elapse
+
+
+async def test_prepare(mocker):
+    events = []
+    alarm = Alarm(
+        callback=lambda: events.append("ring"),
+        prepare_callback=lambda: events.append("prepare"),
+        prepare_lead_s=0.05,
+    )
+    alarm.oneshot = True
+    alarm.target = (datetime.now() + timedelta(seconds=0.1)).time()
+    await asyncio.sleep(0.08)
+    assert events == ["prepare"]
+    await asyncio.sleep(0.1)
+    assert events == ["prepare", "ring"]
+
+
+async def test_prepare_cancelled(mocker):
+    events = []
+
+    async def prepare():
+        await asyncio.sleep(0.05)
+        events.append("prepare")
+
+    alarm = Alarm(callback=mocker.Mock(), prepare_callback=prepare, prepare_lead_s=1)
+    alarm.target = (datetime.now() + timedelta(seconds=0.5)).time()
+    await asyncio.sleep(0.01)
+    assert alarm._prepare_task
+    alarm.enabled = False
+    await asyncio.sleep(0.1)
+    assert not events
+    assert not alarm._prepare_task
+
+
+async def test_history(tmp_path):
+    async def ring():
+        with stage("a"):
+            await asyncio.sleep(0.01)
+        asyncio.create_task(background())
+
+    async def background():
+        with stage("b"):
+            await asyncio.sleep(0.02)
+
+    store = SettingsStore(tmp_path / "settings.json")
+    alarm = CachingAlarm(callback=ring, name="a", store=store)
+    alarm.oneshot = True
+    alarm.target = (datetime.now() + timedelta(seconds=0.05)).time()
+    await asyncio.sleep(0.1)
+    assert alarm.state == alarm.IN_PROGRESS
+    alarm.cancel()
+    await sleep_ms(5)
+    (record,) = alarm.history
+    assert record.late_s < 0.05
+    assert record.elapsed >= record.scheduled
+    assert record.ended
+    assert set(record.stages) == {"a", "b", "callback"}
+    assert record.stages["a"] == pytest.approx(0.01, abs=0.01)
+    alarm = CachingAlarm(callback=ring, name="a", store=store)
+    assert list(alarm.history) == [record]
+
+
+async def test_history_cancelled_ring(tmp_path):
+    async def ring():
+        await asyncio.sleep(10)
+
+    store = SettingsStore(tmp_path / "settings.json")
+    alarm = CachingAlarm(callback=ring, name="a", store=store)
+    alarm.oneshot = True
+    alarm.target = (datetime.now() + timedelta(seconds=0.02)).time()
+    await asyncio.sleep(0.05)
+    alarm.cancel()
+    await sleep_ms(5)
+    (record,) = alarm.history
+    assert record.to_json()["stages"] is not record.stages
+    alarm = CachingAlarm(callback=ring, name="a", store=store)
+    (saved,) = alarm.history
+    assert set(saved.stages) == {"callback"}
+
+
+async def test_skip_cleared_after_elapse(tmp_path):
+    store = SettingsStore(tmp_path / "settings.json")
+    alarm = CachingAlarm(callback=lambda: None, name="a", store=store)
+    alarm.target = (datetime.now() + timedelta(seconds=0.02)).time()
+    yesterday = datetime.now().date() - timedelta(days=1)
+    alarm.recurrence.skip = yesterday
+    await asyncio.sleep(0.05)
+    assert alarm.recurrence.skip == yesterday
+    alarm.cancel()
+    await sleep_ms(5)
+    assert alarm.recurrence.skip is None
+    assert store.section("alarms")["a"]["recurrence"]["skip"] is None
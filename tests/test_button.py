@@ -1,11 +1,20 @@
-import asyncio
+import time
 from collections import namedtuple
 
 import pytest
+from fastapi import HTTPException
 from gpiozero.pins.mock import MockFactory
 from helpers import sleep_ms
 
-from rpi_clock.button import Button, PiButton, ZeroButton
+from rpi_clock.button import (
+    Button,
+    InputDispatcher,
+    InputsEndpoint,
+    LatencyHistogram,
+    PiButton,
+    RotaryEncoder,
+    ZeroButton,
+)
 
 LONG_MS = 10
 DOUBLE_MS = 6
@@ -92,19 +101,85 @@ async def test_blocking_call(mocker, button):
     button["press"] = Blocker()
     button["release"] = mocker.AsyncMock()
     assert not button.in_progress
-    asyncio.create_task(button.call("press"))
+    button.dispatch("press")
     await sleep_ms(1)
     assert button["press"].called
-    asyncio.create_task(button.call("release"))
+    button.dispatch("release")
     await sleep_ms(1)
     not_called(button, "release")
     button["press"].blocked = False
     await sleep_ms(1)
-    asyncio.create_task(button.call("release"))
+    button.dispatch("release")
     await sleep_ms(1)
     called_once(button, "release")
 
 
+async def test_blocking_dispatch(button):
+    button.blocking = True
+    button["press"] = Blocker()
+    button.dispatch("press")
+    await sleep_ms(1)
+    button.dispatch("release")
+    button["press"].blocked = False
+    await sleep_ms(3)
+    not_called(button, "release")
+    assert button.dropped["release"] == 1
+
+
+@pytest.mark.parametrize(
+    "policy,called",
+    [
+        ("drop-new", []),
+        ("latest", ["double"]),
+        ("queue", ["release", "long", "double"]),
+    ],
+)
+async def test_dispatch_policy(button, policy, called):
+    button.policy = policy
+    button.queue_len = 3
+    button["press"] = Blocker()
+    for hook in ("press", "release", "long", "double"):
+        button.dispatch(hook)
+    await sleep_ms(1)
+    assert button["press"].called
+    button["press"].blocked = False
+    await sleep_ms(3)
+    for hook in ("release", "long", "double"):
+        if hook in called:
+            called_once(button, hook)
+        else:
+            not_called(button, hook)
+    assert sum(button.dropped.values()) == 3 - len(called)
+
+
+async def test_dispatch_queue_full(button):
+    button.queue_len = 1
+    button["press"] = Blocker()
+    for hook in ("press", "release", "long"):
+        button.dispatch(hook)
+    button["press"].blocked = False
+    await sleep_ms(3)
+    called_once(button, "release")
+    not_called(button, "long")
+    assert button.dropped == {"long": 1}
+
+
+async def test_run_time(button):
+    async def slow(_):
+        await sleep_ms(5)
+
+    button["press"] = slow
+    await button.call("press")
+    await button.call("press")
+    assert button.runs["press"] == 2
+    assert button.run_s["press"] >= 0.01
+
+
+def test_bad_policy():
+    with pytest.raises(ValueError):
+        Button(policy="wibble")
+
+
 async def test_press(button):
     press(button)
     await sleep_ms(1)
@@ -135,6 +210,67 @@ async def test_press_release(button):
     not_called(button, "long")
 
 
+async def test_edges_queued(button):
+    # Both edges land before the loop gets a look in.
+    press(button)
+    release(button)
+    await sleep_ms(1)
+    called_once(button, "press")
+    called_once(button, "release")
+    assert not button.state
+
+
+async def test_edge_overflow(button):
+    del button["double"]
+    button._inputs = InputDispatcher(queue_len=2)
+    button._inputs.register(button)
+    for _ in range(2):
+        press(button)
+        release(button)
+    assert button.edge_overflows == 2
+    await sleep_ms(1)
+    called_once(button, "press")
+    called_once(button, "release")
+
+
+def edges(button, *timed_edges):
+    """Queue edges at given ms since now, as if the loop were blocked."""
+    start = button._ticks()
+    for ms, down in timed_edges:
+        level = Button.FALLING_EDGE if down != button.inverted else Button.RISING_EDGE
+        button._callback(level, start + ms / 1_000)
+
+
+async def test_double_press_busy_loop(button):
+    button.suppress = True
+    edges(button, (0, True), (1, False), (3, True), (4, False))
+    # Block well past the double window before the edges are seen.
+    time.sleep(2 * DOUBLE_MS / 1_000)
+    await sleep_ms(1)
+    called_once(button, "double")
+    not_called(button, "release")
+    assert button["press"].call_count == 2
+
+
+async def test_long_press_busy_loop(button):
+    button.suppress = True
+    edges(button, (0, True), (LONG_MS + 1, False))
+    time.sleep(2 * LONG_MS / 1_000)
+    await sleep_ms(1)
+    called_once(button, "long")
+    not_called(button, "release")
+    not_called(button, "double")
+
+
+async def test_short_press_busy_loop(button):
+    button.suppress = True
+    edges(button, (0, True), (1, False), (DOUBLE_MS + 1, True), (DOUBLE_MS + 2, False))
+    time.sleep(2 * DOUBLE_MS / 1_000)
+    await sleep_ms(DOUBLE_MS)
+    not_called(button, "double")
+    assert button["release"].call_count == 2
+
+
 async def test_long_press(button):
     press(button)
     await sleep_ms(LONG_MS + 2)
@@ -184,6 +320,19 @@ async def test_single_press_suppress(button):
     not_called(button, "long")
 
 
+async def test_single_press_suppress_held(button):
+    button.suppress = True
+    del button["press"]
+    del button["double"]
+    del button["long"]
+    press(button)
+    await sleep_ms(LONG_MS + 2)
+    not_called(button, "release")
+    release(button)
+    await sleep_ms(1)
+    called_once(button, "release")
+
+
 async def test_long_hold(button):
     del button["press"]
     press(button)
@@ -296,6 +445,41 @@ async def test_double_press_suppress(button):
     not_called(button, "long")
 
 
+async def test_repeat(button, mocker):
+    button.suppress = True
+    del button["long"]
+    button["repeat"] = mocker.Mock()
+    button.repeat_ms = 40
+    button.repeat_min_ms = 20
+    button.repeat_accel = 0.5
+    press(button)
+    await sleep_ms(LONG_MS + 10)
+    button["repeat"].assert_not_called()
+    # Repeats 40ms after the hold, then every 20ms.
+    await sleep_ms(30 + 20 + 20 + 10)
+    assert button["repeat"].call_count == 3
+    assert button.repeat_count == 3
+    release(button)
+    await sleep_ms(40)
+    assert button["repeat"].call_count == 3
+    # A hold with repeats isn't a click.
+    not_called(button, "release")
+
+
+async def test_repeat_with_long(button, mocker):
+    button["repeat"] = mocker.Mock()
+    button.repeat_ms = button.repeat_min_ms = 2
+    press(button)
+    await sleep_ms(LONG_MS + 5)
+    called_once(button, "long")
+    button["repeat"].assert_called()
+
+
+def test_repeat_interval():
+    b = Button(repeat_ms=100, repeat_min_ms=30, repeat_accel=0.5)
+    assert [b.repeat_interval_ms(x) for x in range(4)] == [100, 50, 30, 30]
+
+
 def test_properties(button):
     assert button.double_ms == DOUBLE_MS
     button.double_ms = 2 * DOUBLE_MS
@@ -311,13 +495,14 @@ def test_invalid_hook(button):
         button["nonsuch"] = lambda x: x
 
 
-async def test_invalid_edge(button):
+async def test_invalid_edge(button, mocker):
+    button._logger = mocker.Mock()
     button._callback(99)
-    task = next(
-        x for x in asyncio.all_tasks() if "_button_check_loop" in x.get_coro().__name__
-    )
+    press(button)
     await sleep_ms(1)
-    assert task.exception()
+    button._logger.exception.assert_called_once()
+    # The dispatcher survives to handle the next.
+    called_once(button, "press")
 
 
 async def test_pibutton(mocker):
@@ -422,6 +607,165 @@ async def test_zero_button():
     assert not b.state
 
 
+async def test_zero_button_ticks(mocker):
+    b = ZeroButton(1, pin_factory=MockFactory())
+    handle = mocker.spy(b, "_handle_edge")
+    b._pin.drive_low()
+    b._pin.drive_high()
+    await sleep_ms(2)
+    (first, _), (second, _) = [x.args for x in handle.call_args_list]
+    assert 0 < second - first < 0.01
+
+
 def test_zero_button_debounce():
     b = ZeroButton(1, pin_factory=MockFactory(), debounce_ms=100)
     assert b._pin.bounce == 0.1
+
+
+async def test_shared_dispatcher(mocker):
+    inputs = InputDispatcher()
+    factory = MockFactory()
+    buttons = [ZeroButton(pin, pin_factory=factory, inputs=inputs) for pin in (1, 2)]
+    for b in buttons:
+        b["press"] = mocker.Mock()
+    assert list(inputs.inputs.values()) == buttons
+    for b in buttons:
+        b._pin.drive_low()
+    await sleep_ms(2)
+    for b in buttons:
+        assert b.state
+        b["press"].assert_called_once()
+    assert inputs.edges == 2
+    assert inputs.wakeups == 1
+
+
+CLOCKWISE = ((1, 0), (0, 0), (1, 1), (0, 1))
+ANTICLOCKWISE = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+
+def turn(encoder: RotaryEncoder, detents: int):
+    steps = CLOCKWISE if detents > 0 else ANTICLOCKWISE
+    for _ in range(abs(detents)):
+        for channel, level in steps:
+            pin = encoder._pins[channel]
+            pin.drive_high() if level else pin.drive_low()
+
+
+@pytest.fixture
+def encoder():
+    return RotaryEncoder(1, 2, pin_factory=MockFactory())
+
+
+async def test_encoder_turn(encoder, mocker):
+    encoder["turn"] = mocker.Mock()
+    turn(encoder, 3)
+    await sleep_ms(1)
+    encoder["turn"].assert_called_once_with(encoder, 3)
+    turn(encoder, -2)
+    await sleep_ms(1)
+    encoder["turn"].assert_called_with(encoder, -2)
+    assert encoder.position == 1
+    assert not encoder.errors
+
+
+async def test_encoder_batches(encoder):
+    deltas = []
+
+    async def slow(_, delta):
+        deltas.append(delta)
+        await sleep_ms(5)
+
+    encoder["turn"] = slow
+    turn(encoder, 1)
+    await sleep_ms(1)
+    turn(encoder, 4)
+    await sleep_ms(1)
+    turn(encoder, 3)
+    await sleep_ms(10)
+    assert deltas == [1, 7]
+    assert encoder.dispatches == 2
+
+
+async def test_encoder_bounce(encoder, mocker):
+    encoder["turn"] = mocker.Mock()
+    # Half a detent and back, with the first edge bouncing.
+    a, b = encoder._pins
+    b.drive_low()
+    b.drive_high()
+    b.drive_low()
+    a.drive_low()
+    a.drive_high()
+    b.drive_high()
+    await sleep_ms(1)
+    encoder["turn"].assert_not_called()
+    turn(encoder, 1)
+    await sleep_ms(1)
+    encoder["turn"].assert_called_once_with(encoder, 1)
+
+
+async def test_encoder_missed_edge(encoder, mocker):
+    encoder["turn"] = mocker.Mock()
+    encoder._handle_edge(0, (1, 0))
+    encoder._handle_edge(0, (0, 0))
+    # The rising edge of B went missing.
+    encoder._handle_edge(0, (1, 0))
+    assert encoder.errors == 1
+    assert encoder.position == 0
+
+
+def test_encoder_invalid_hook(encoder):
+    with pytest.raises(ValueError):
+        encoder["press"] = lambda *_: None
+
+
+def test_latency_histogram():
+    hist = LatencyHistogram()
+    for ms in (0.5, 3, 3, 40, 2_000):
+        hist.record(ms / 1_000)
+    assert hist.count == 5
+    assert hist.max_s == 2
+    assert hist.percentile(50) == 0.005
+    assert hist.percentile(80) == 0.05
+    assert hist.percentile(99) == 2
+    buckets = hist.to_json()["buckets"]
+    assert buckets["<=1ms"] == 1
+    assert buckets["<=5ms"] == 2
+    assert buckets[">1000ms"] == 1
+
+
+async def test_latency(button):
+    button.suppress = True
+    del button["double"]
+    press(button)
+    await sleep_ms(1)
+    release(button)
+    await sleep_ms(1)
+    summary = button.summary()
+    assert summary["edge_latency"]["count"] == 2
+    assert 0 < summary["edge_latency"]["max_s"] < 0.05
+    assert summary["handler_time"]["count"] == 2
+    assert summary["runs"] == {"press": 1, "release": 1}
+    assert summary["suppressed"] == {"release": 1}
+
+
+async def test_long_latency(button):
+    # Latency for a timeout runs from when it was due, not from the press.
+    press(button)
+    await sleep_ms(LONG_MS + 2)
+    assert button.edge_latency.count == 2
+    assert button.edge_latency.max_s < LONG_MS / 1_000
+
+
+async def test_inputs_endpoint(mocker):
+    inputs = InputDispatcher()
+    b = ZeroButton(1, pin_factory=MockFactory(), inputs=inputs, name="Buttonhole")
+    b["press"] = mocker.Mock()
+    b._pin.drive_low()
+    await sleep_ms(1)
+    endpoint = InputsEndpoint(thing=inputs, prefix="/inputs")
+    summaries = endpoint.get_summaries()
+    assert summaries["dispatcher"]["edges"] == 1
+    assert summaries["inputs"]["Buttonhole"]["runs"] == {"press": 1}
+    assert endpoint.get_summary("Buttonhole")["edge_latency"]["count"] == 1
+    with pytest.raises(HTTPException):
+        endpoint.get_summary("nonsuch")
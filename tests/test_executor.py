@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from time import sleep
+
+from rpi_clock.executor import HardwareExecutor
+
+
+async def test_runs_in_worker_thread():
+    executor = HardwareExecutor("test")
+    thread = await executor.run("thread", threading.current_thread)
+    assert thread is not threading.current_thread()
+    assert thread is await executor.run("thread", threading.current_thread)
+    executor.shutdown()
+
+
+async def test_loop_not_blocked():
+    executor = HardwareExecutor("test")
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.001)
+            ticks += 1
+
+    task = asyncio.create_task(tick())
+    await executor.run("sleep", sleep, 0.05)
+    task.cancel()
+    assert ticks > 10
+    executor.shutdown()
+
+
+async def test_serialised():
+    executor = HardwareExecutor("test")
+    order = []
+
+    def cmd(x):
+        sleep(0.001)
+        order.append(x)
+        return x
+
+    results = await asyncio.gather(*(executor.run("cmd", cmd, x) for x in range(10)))
+    assert results == list(range(10))
+    assert order == list(range(10))
+    executor.shutdown()
+
+
+async def test_stats():
+    executor = HardwareExecutor("test")
+    await asyncio.gather(*(executor.run("sleep", sleep, 0.01) for _ in range(3)))
+    stats = executor.stats["sleep"]
+    assert stats.count == 3
+    assert stats.max_s >= 0.03
+    assert stats.max_wait_s >= 0.02
+    assert stats.mean_s >= 0.01
+    assert executor.summary()["sleep"]["count"] == 3
+    executor.shutdown()
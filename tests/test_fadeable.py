@@ -3,14 +3,18 @@ import asyncio
 import pytest
 from gpiozero.pins.mock import MockFactory
 
+from rpi_clock.curves import lut, position
 from rpi_clock.fadeable import (
     PWM,
+    CachingFadeable,
     Device,
+    FadeableEndpoint,
     Lamp,
     MockFadeable,
     SpiControllerError,
     SPIFixedRate,
 )
+from rpi_clock.store import SettingsStore
 
 
 async def test_set_duty():
@@ -22,6 +26,30 @@ async def test_set_duty():
     f.get_duty_mock.assert_called_once()
 
 
+async def test_shadow():
+    f = MockFadeable(shadow=True)
+    f.get_duty_mock.return_value = 12
+    assert await f.get_duty() == 12
+    assert await f.get_percent_duty() == 0.12
+    f.get_duty_mock.assert_awaited_once()
+    await f.set_duty(51)
+    assert await f.get_duty() == 51
+    f.get_duty_mock.assert_awaited_once()
+
+
+async def test_reconcile(mocker):
+    f = MockFadeable(shadow=True, reconcile_s=0.01)
+    f._logger = mocker.Mock()
+    await f.start()
+    assert not await f.reconcile()
+    f.get_duty_mock.return_value = 20
+    await asyncio.sleep(0.015)
+    assert f.drift_count == 1
+    f._logger.warning.assert_called_once()
+    assert await f.get_duty() == 20
+    f._reconcile_task.cancel()
+
+
 async def test_set_out_of_range():
     f = MockFadeable()
     await f.set_duty(999999)
@@ -71,10 +99,180 @@ async def test_fade(mocker, start, end):
     f = MockFadeable()
     await f.set_duty(start)
     await f.fade(duty=end, duration=0.01)
-    step = -1 if end < start else 1
-    f.set_duty_mock.assert_has_calls(
-        [mocker.call(x) for x in range(start, end + step, step)]
-    )
+    duties = [x.args[0] for x in f.set_duty_mock.call_args_list]
+    assert duties[0] == start
+    assert duties[-1] == end
+    # frames may be skipped, but the fade must be monotonic.
+    assert duties == sorted(duties, reverse=end < start)
+
+
+async def test_fade_slow_hardware():
+    async def slow_write(_):
+        await asyncio.sleep(0.02)
+
+    f = MockFadeable()
+    f.set_duty_mock.side_effect = slow_write
+    await f.set_duty(0)
+    start = asyncio.get_running_loop().time()
+    overrun = await f.fade(duty=100, duration=0.2)
+    elapsed = asyncio.get_running_loop().time() - start
+    assert elapsed == pytest.approx(0.2, abs=0.05)
+    assert overrun < 0.05
+    assert f.set_duty_mock.call_count < 20
+    f.set_duty_mock.assert_called_with(100)
+
+
+@pytest.mark.parametrize("curve", ["cie1931", "gamma", "log", "ease-in-out"])
+async def test_fade_curve(curve):
+    f = MockFadeable()
+    await f.set_duty(0)
+    await f.fade(duty=100, duration=0.05, curve=curve)
+    duties = [x.args[0] for x in f.set_duty_mock.call_args_list]
+    assert duties == sorted(duties)
+    assert duties[-1] == 100
+
+
+async def test_fade_unknown_curve():
+    f = MockFadeable()
+    with pytest.raises(ValueError):
+        await f.fade(duty=100, curve="nonsuch")
+
+
+def test_lut_cached():
+    table = lut("cie1931", 10, 1023)
+    assert lut("cie1931", 10, 1023) is table
+    assert table[0] == 10
+    assert table[-1] == 1023
+    assert len(table) == 1023 - 10 + 1
+    assert list(table) == sorted(table)
+    assert position(table, 1023) == len(table) - 1
+    assert table[position(table, 500)] >= 500
+    # perceptual curves spend longer at the dim end.
+    assert table[len(table) // 2] < lut("linear", 10, 1023)[len(table) // 2]
+
+
+async def test_coalesce():
+    written = []
+
+    async def slow_write(val):
+        await asyncio.sleep(0.01)
+        written.append(val)
+
+    f = MockFadeable(coalesce=True)
+    f.set_duty_mock.side_effect = slow_write
+    await asyncio.gather(*(f.set_duty(x) for x in range(10)))
+    # requests made before the writer gets going all collapse onto the newest.
+    assert written == [9]
+    assert f.writes_coalesced == 9
+    assert f.writes_dropped == 9
+    assert f._duty == 9
+
+    first = asyncio.create_task(f.set_duty(20))
+    await asyncio.sleep(0.001)
+    await asyncio.gather(*(f.set_duty(x) for x in range(30, 35)), first)
+    assert written == [9, 20, 34]
+    assert f.writes_dropped == 13
+
+
+async def test_coalesce_error():
+    f = MockFadeable(coalesce=True)
+    f.set_duty_mock.side_effect = OSError
+    with pytest.raises(OSError):
+        await asyncio.gather(f.set_duty(1), f.set_duty(2))
+    f.set_duty_mock.side_effect = None
+    await f.set_duty(3)
+    f.set_duty_mock.assert_called_with(3)
+
+
+async def test_retarget():
+    f = MockFadeable(max_fade_freq_hz=100)
+    await f.set_duty(0)
+    fade = asyncio.create_task(f.fade(duty=100, duration=0.2))
+    await asyncio.sleep(0.1)
+    task = f._fade_task
+    midway = f._duty
+    assert 30 < midway < 70
+    start = asyncio.get_running_loop().time()
+    await f.retarget(duty=0, duration=0.1)
+    assert asyncio.get_running_loop().time() - start == pytest.approx(0.1, abs=0.03)
+    assert await fade < 0.03
+    assert f._fade_task is None
+    assert task.done() and not task.cancelled()
+    duties = [x.args[0] for x in f.set_duty_mock.call_args_list]
+    peak = duties.index(max(duties))
+    # no jump back to the start: the fade turned round where it was.
+    assert max(duties) <= midway + 5
+    assert duties[:peak] == sorted(duties[:peak])
+    assert duties[peak:] == sorted(duties[peak:], reverse=True)
+    assert duties[-1] == 0
+
+
+async def test_retarget_keeps_deadline():
+    f = MockFadeable(max_fade_freq_hz=100)
+    await f.set_duty(0)
+    start = asyncio.get_running_loop().time()
+    fade = asyncio.create_task(f.fade(duty=100, duration=0.2))
+    await asyncio.sleep(0.05)
+    await f.retarget(duty=50)
+    assert asyncio.get_running_loop().time() - start == pytest.approx(0.2, abs=0.03)
+    await fade
+    f.set_duty_mock.assert_called_with(50)
+
+
+async def test_retarget_final_write():
+    f = MockFadeable(max_fade_freq_hz=100)
+    await f.set_duty(0)
+
+    async def slow(val):
+        if val == 100:
+            await asyncio.sleep(0.05)
+
+    f.set_duty_mock.side_effect = slow
+    fade = asyncio.create_task(f.fade(duty=100, duration=0.05))
+    await asyncio.sleep(0.07)
+    # The fade is writing its final duty.
+    assert f._plan and f._plan.duty == 100
+    await f.retarget(duty=0, duration=0.01)
+    await fade
+    f.set_duty_mock.assert_called_with(0)
+    assert await f.get_duty() == 0
+
+
+async def test_retarget_idle():
+    f = MockFadeable()
+    await f.set_duty(0)
+    await f.retarget(duty=10, duration=0.01)
+    f.set_duty_mock.assert_called_with(10)
+
+
+async def test_fade_history():
+    f = MockFadeable(max_fade_freq_hz=100)
+    await f.set_duty(0)
+    await f.fade(duty=100, duration=0.1)
+    stats = f.fade_history[-1]
+    assert stats.duty == 100
+    assert not stats.cancelled
+    assert 5 < stats.steps <= 12
+    assert stats.interval_p50_s == pytest.approx(0.01, abs=0.005)
+    assert stats.interval_p99_s >= stats.interval_p50_s
+    assert stats.total_s == pytest.approx(0.1, abs=0.03)
+    assert stats.retries == 0
+
+    task = asyncio.create_task(f.fade(duty=0, duration=1))
+    await asyncio.sleep(0.05)
+    f.cancel_fade()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert f.fade_history[-1].cancelled
+    assert len(f.fade_history) == 2
+
+
+async def test_fade_history_bounded():
+    f = MockFadeable()
+    await f.set_duty(0)
+    for x in range(f.FADE_HISTORY + 5):
+        await f.fade(duty=x % 2, duration=0)
+    assert len(f.fade_history) == f.FADE_HISTORY
 
 
 async def test_fade_freq():
@@ -225,3 +423,71 @@ async def test_reset(lamp, mocker):
     lamp.cs = cs
     await lamp.reset()
     state.assert_has_calls([mocker.call(0), mocker.call(1)])
+
+
+class FakeController:
+    """A fake lamp controller speaking the spi protocol."""
+
+    def __init__(self, drop_every: int = 0):
+        self.duty = 0
+        self.writes = 0
+        self.reads = 0
+        self.drop_every = drop_every
+
+    def __call__(self, data: bytes) -> bytes:
+        cmd = bytes(data[:-1])
+        if cmd.startswith(b"s"):
+            self.writes += 1
+            if not self.drop_every or self.writes % self.drop_every:
+                self.duty = int(cmd[1:])
+            return b" " * len(data)
+        self.reads += 1
+        return f"{self.duty:>4}#".encode()
+
+
+async def test_hardware_latency_endpoint(lamp):
+    lamp.spi.transfer = FakeController()
+    await lamp.set_duty(100)
+    endpoint = FadeableEndpoint(thing=lamp, prefix="/lamp")
+    latency = endpoint.get_hardware_latency()
+    assert latency
+    assert all(x["count"] for x in latency.values())
+    assert "/lamp/hardware" in [x.path for x in endpoint.router.routes]
+    endpoint = FadeableEndpoint(thing=MockFadeable(), prefix="/mock")
+    assert "/mock/hardware" not in [x.path for x in endpoint.router.routes]
+
+
+async def test_stream_fade(lamp):
+    lamp.spi.transfer = FakeController()
+    lamp.stream_checkpoint = 8
+    lamp.max_fade_freq_hz = 1000
+    await lamp.fade(duty=200, duration=0.1)
+    assert lamp.spi.transfer.duty == 200
+    assert await lamp.get_duty() == 200
+    assert lamp.spi.transfer.reads < lamp.spi.transfer.writes / 4
+
+
+async def test_stream_fade_resync(lamp, mocker):
+    lamp.spi.transfer = FakeController(drop_every=3)
+    lamp.stream_checkpoint = 4
+    lamp.max_fade_freq_hz = 1000
+    lamp.set_hardware_duty = mocker.AsyncMock(wraps=lamp.set_hardware_duty)
+    await lamp.fade(duty=100, duration=0.05)
+    assert lamp.spi.transfer.duty == 100
+    assert lamp.fade_history[-1].retries == lamp.hardware_retries
+    # final set, plus at least one resync
+    assert lamp.set_hardware_duty.await_count > 1
+
+
+class CachingMockFadeable(CachingFadeable, MockFadeable):
+    pass
+
+
+async def test_migrate_cache(tmp_path):
+    (tmp_path / "thing.json").write_text('{"max_duty": 50}')
+    store = SettingsStore(tmp_path / "settings.json", debounce_s=60)
+    f = CachingMockFadeable(name="thing", cache_dir=tmp_path, store=store)
+    assert f.max_duty == 50
+    assert not (tmp_path / "thing.json").exists()
+    # Written through before the old file went.
+    assert SettingsStore(tmp_path / "settings.json").get("thing", "max_duty") == 50
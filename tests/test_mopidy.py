@@ -0,0 +1,146 @@
+import pytest
+
+from rpi_clock.mopidy import AlarmPlayer, MopidySession, MopidyVolume, PlaylistIndex
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.AsyncMock()
+    client.is_connected = mocker.Mock(return_value=True)
+    client.bind = mocker.Mock()
+    client.playlists.as_list.return_value = [
+        {"name": "alarm", "uri": "uri:alarm"},
+        {"name": "other", "uri": "uri:other"},
+    ]
+    client.playlists.lookup.return_value = {"tracks": [{"uri": "a"}, {"uri": "b"}]}
+    mocker.patch("rpi_clock.mopidy.MopidyClient", return_value=client)
+    return client
+
+
+@pytest.fixture
+def session(mocker):
+    session = MopidySession()
+    session.MIN_BACKOFF_S = 0.001
+    return session
+
+
+async def test_connection_reused(session, client):
+    volume = MopidyVolume(session=session)
+    client.mixer.get_volume.return_value = 12
+    for i in range(10):
+        await volume.set_duty(i)
+        assert await volume.get_hardware_duty() == 12
+    client.connect.assert_awaited_once()
+
+
+async def test_reconnect_with_backoff(session, client, mocker):
+    sleep = mocker.patch("rpi_clock.mopidy.asyncio.sleep", mocker.AsyncMock())
+    fn = mocker.AsyncMock(side_effect=[OSError, OSError, "ok"])
+    assert await session.call(fn) == "ok"
+    assert client.connect.await_count == 3
+    assert [x.args[0] for x in sleep.await_args_list] == [0.001, 0.002]
+
+
+async def test_call_gives_up(session, client, mocker):
+    mocker.patch("rpi_clock.mopidy.asyncio.sleep", mocker.AsyncMock())
+    fn = mocker.AsyncMock(side_effect=OSError)
+    with pytest.raises(OSError):
+        await session.call(fn, attempts=2)
+    assert fn.await_count == 2
+
+
+async def test_health_check_drops_dead_connection(session, client):
+    client.core.get_version.side_effect = OSError
+    assert not await session.check_health()
+    assert not session.connected
+    client.core.get_version.side_effect = None
+    assert await session.warm()
+    assert session.connected
+
+
+async def test_health_check_logs_outage_once(session, client, mocker):
+    session._logger = mocker.Mock()
+    client.core.get_version.side_effect = OSError
+    for _ in range(3):
+        assert not await session.check_health()
+    session._logger.warning.assert_called_once()
+    failures = [
+        x for x in session._logger.debug.call_args_list if "failed" in x.args[0]
+    ]
+    assert len(failures) == 2
+    session._logger.info.assert_not_called()
+    client.core.get_version.side_effect = None
+    assert await session.check_health()
+    assert await session.check_health()
+    session._logger.info.assert_called_once_with("Connection recovered")
+
+
+async def test_prepared_play(session, client):
+    player = AlarmPlayer(session, PlaylistIndex(session))
+    assert await player.prepare()
+    assert player.prepared
+    client.tracklist.add.assert_awaited_once_with(uris=["a", "b"])
+    client.tracklist.shuffle.assert_awaited_once()
+    await player.play()
+    client.tracklist.shuffle.assert_awaited_once()
+    client.playback.play.assert_awaited_once()
+    assert not player.prepared
+    await player.play()
+    assert client.tracklist.shuffle.await_count == 2
+
+
+@pytest.mark.parametrize("state", ["playing", "paused"])
+async def test_prepare_leaves_playback(session, client, state):
+    client.playback.get_state.return_value = state
+    player = AlarmPlayer(session, PlaylistIndex(session))
+    assert not await player.prepare()
+    client.tracklist.clear.assert_not_awaited()
+    await player.play()
+    client.tracklist.clear.assert_awaited_once()
+    client.playback.play.assert_awaited_once()
+
+
+async def test_prepare_expires(session, client):
+    player = AlarmPlayer(session, PlaylistIndex(session))
+    player.PREPARED_TTL_S = 0
+    assert await player.prepare()
+    assert not player.prepared
+
+
+async def test_prepare_fails(session, client, mocker):
+    mocker.patch("rpi_clock.mopidy.asyncio.sleep", mocker.AsyncMock())
+    player = AlarmPlayer(session, PlaylistIndex(session), playlist="missing")
+    assert not await player.prepare()
+    assert not player.prepared
+
+
+async def test_playlist_index_cached(session, client):
+    index = PlaylistIndex(session)
+    for _ in range(3):
+        assert await index.tracks("alarm") == ["a", "b"]
+    client.playlists.as_list.assert_awaited_once()
+    client.playlists.lookup.assert_awaited_once_with("uri:alarm")
+    assert await index.names() == ["alarm", "other"]
+    assert (index.hits, index.misses) == (3, 1)
+
+
+async def test_playlist_index_invalidated(session, client):
+    index = PlaylistIndex(session)
+    await index.tracks("alarm")
+    bound = {x.args[0]: x.args[1] for x in client.bind.call_args_list}
+    await bound["playlist_changed"]({"playlist": {}})
+    await index.tracks("alarm")
+    assert client.playlists.as_list.await_count == 2
+    assert client.playlists.lookup.await_count == 2
+    # Events may be missed whilst disconnected.
+    await session.disconnect()
+    await index.uri("alarm")
+    assert client.playlists.as_list.await_count == 3
+
+
+async def test_playlist_index_ttl(session, client):
+    index = PlaylistIndex(session)
+    index.TTL_S = 0
+    await index.uri("alarm")
+    await index.uri("alarm")
+    assert client.playlists.as_list.await_count == 2
@@ -0,0 +1,72 @@
+from datetime import date, datetime, time
+
+import pytest
+
+from rpi_clock.recurrence import EVERY_DAY, WEEKDAYS, Recurrence
+
+# A Friday.
+FRIDAY = datetime(2024, 5, 3, 9, 0)
+
+
+def test_daily():
+    r = Recurrence()
+    assert r.next_elapse(time(10), FRIDAY) == datetime(2024, 5, 3, 10)
+    assert r.next_elapse(time(8), FRIDAY) == datetime(2024, 5, 4, 8)
+    assert r.next_elapse(time(9), FRIDAY) == FRIDAY
+
+
+def test_weekdays():
+    r = Recurrence(weekdays=WEEKDAYS)
+    assert r.next_elapse(time(8), FRIDAY) == datetime(2024, 5, 6, 8)
+    assert r.next_elapse(time(10), FRIDAY) == datetime(2024, 5, 3, 10)
+
+
+def test_skip():
+    r = Recurrence(skip=date(2024, 5, 3))
+    assert r.next_elapse(time(10), FRIDAY) == datetime(2024, 5, 4, 10)
+    assert r.next_elapse(time(10), datetime(2024, 5, 10)) == datetime(2024, 5, 10, 10)
+    assert r.skip == date(2024, 5, 3)
+
+
+def test_dates():
+    r = Recurrence(weekdays=0, dates={date(2024, 5, 10), date(2024, 5, 1)})
+    assert r.next_elapse(time(8), FRIDAY) == datetime(2024, 5, 10, 8)
+    assert r.next_elapse(time(8), datetime(2024, 5, 11)) is None
+    r = Recurrence(weekdays=1, dates={date(2024, 5, 4)})
+    assert r.next_elapse(time(8), FRIDAY) == datetime(2024, 5, 4, 8)
+
+
+def test_until():
+    r = Recurrence(until=date(2024, 5, 3))
+    assert r.next_elapse(time(10), FRIDAY) == datetime(2024, 5, 3, 10)
+    assert r.next_elapse(time(8), FRIDAY) is None
+
+
+@pytest.mark.parametrize(
+    "rule, weekdays, until",
+    [
+        ("FREQ=DAILY", EVERY_DAY, None),
+        ("RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR", WEEKDAYS, None),
+        ("freq=weekly;byday=sa", 1 << 5, None),
+        ("FREQ=DAILY;UNTIL=20240601T000000Z", EVERY_DAY, date(2024, 6, 1)),
+    ],
+)
+def test_rrule(rule, weekdays, until):
+    r = Recurrence.from_rrule(rule)
+    assert r.weekdays == weekdays
+    assert r.until == until
+    assert Recurrence.from_rrule(r.to_rrule()) == r
+
+
+@pytest.mark.parametrize(
+    "rule",
+    ["FREQ=MONTHLY", "FREQ=WEEKLY", "FREQ=WEEKLY;BYDAY=XX", "FREQ=DAILY;COUNT=3", "x"],
+)
+def test_bad_rrule(rule):
+    with pytest.raises(ValueError):
+        Recurrence.from_rrule(rule)
+
+
+def test_skip_only_day():
+    r = Recurrence(weekdays=1 << 4, skip=date(2024, 5, 10))
+    assert r.next_elapse(time(8), FRIDAY) == datetime(2024, 5, 17, 8)
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from rpi_clock.scheduler import Scheduler
+
+
+def after(seconds):
+    return datetime.now() + timedelta(seconds=seconds)
+
+
+async def test_sleep_until():
+    s = Scheduler()
+    start = datetime.now()
+    await s.sleep_until(after(0.05))
+    assert (datetime.now() - start).total_seconds() == pytest.approx(0.05, abs=0.02)
+
+
+async def test_past():
+    s = Scheduler()
+    await s.sleep_until(after(-1))
+    assert s.next_deadline is None
+
+
+async def test_order_and_rearm():
+    s = Scheduler()
+    woken = []
+
+    async def wait(name, deadline):
+        await s.sleep_until(deadline)
+        woken.append(name)
+
+    late = asyncio.create_task(wait("late", after(0.1)))
+    await asyncio.sleep(0.01)
+    early = asyncio.create_task(wait("early", after(0.03)))
+    await asyncio.gather(late, early)
+    assert woken == ["early", "late"]
+
+
+async def test_idle_wakeups():
+    s = Scheduler()
+    task = asyncio.create_task(s.sleep_until(after(10)))
+    await asyncio.sleep(0.1)
+    # one wakeup to arm, none whilst waiting.
+    assert s.wakeups <= 1
+    task.cancel()
+    await asyncio.sleep(0.01)
+    assert s.next_deadline is None
+
+
+async def test_clock_jump(mocker):
+    s = Scheduler()
+    s.MAX_SLEEP_S = 0.01
+    task = asyncio.create_task(s.sleep_until(after(3600)))
+    await asyncio.sleep(0.02)
+    assert not s.jumps
+    # wall clock steps an hour forwards.
+    now = datetime.now() + timedelta(hours=1, seconds=1)
+    mocker.patch("rpi_clock.scheduler.datetime").now.return_value = now
+    mocker.patch("rpi_clock.scheduler.time", side_effect=lambda: now.timestamp())
+    await asyncio.sleep(0.05)
+    assert s.jumps
+    assert task.done()
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from rpi_clock.fadeable import CachingFadeable, MockFadeable
+from rpi_clock.store import SettingsStore
+
+
+class CachingMockFadeable(CachingFadeable, MockFadeable):
+    pass
+
+
+async def test_write_behind(tmp_path):
+    path = tmp_path / "settings.json"
+    store = SettingsStore(path, debounce_s=0.01)
+    for i in range(100):
+        store.set("lamp", "max_duty", i)
+    assert store.get("lamp", "max_duty") == 99
+    assert not path.exists()
+    await asyncio.sleep(0.02)
+    assert json.loads(path.read_text()) == {"lamp": {"max_duty": 99}}
+    assert not store.dirty
+
+
+async def test_flush(tmp_path):
+    path = tmp_path / "settings.json"
+    store = SettingsStore(path, debounce_s=10)
+    store.set("lamp", "min_duty", 3)
+    store.flush()
+    assert SettingsStore(path).section("lamp") == {"min_duty": 3}
+    assert not path.with_suffix(".tmp").exists()
+
+
+def test_no_loop(tmp_path):
+    path = tmp_path / "settings.json"
+    SettingsStore(path).set("lamp", "min_duty", 3)
+    assert path.exists()
+
+
+def test_corrupt(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("{")
+    assert SettingsStore(path).section("lamp") == {}
+
+
+def test_recover_backup(tmp_path):
+    path = tmp_path / "settings.json"
+    store = SettingsStore(path)
+    store.set("lamp", "min_duty", 3)
+    store.set("lamp", "min_duty", 4)
+    assert json.loads(store.backup.read_text()) == {"lamp": {"min_duty": 3}}
+    path.write_text('{"lamp": {"min')
+    assert SettingsStore(path).section("lamp") == {"min_duty": 3}
+    path.unlink()
+    assert SettingsStore(path).section("lamp") == {"min_duty": 3}
+
+
+async def test_stale_write(tmp_path):
+    path = tmp_path / "settings.json"
+    store = SettingsStore(path, debounce_s=0)
+    store.set("lamp", "min_duty", 3)
+    await asyncio.sleep(0)
+    # Overtake the background write with a newer one.
+    store.set("lamp", "min_duty", 4)
+    store.flush()
+    await asyncio.sleep(0.05)
+    assert json.loads(path.read_text()) == {"lamp": {"min_duty": 4}}
+
+
+async def test_remove(tmp_path):
+    path = tmp_path / "settings.json"
+    store = SettingsStore(path, debounce_s=0.01)
+    store.set("lamp", "min_duty", 3)
+    store.remove("lamp", "min_duty")
+    store.remove("lamp", "min_duty")
+    assert "lamp" not in store
+    await asyncio.sleep(0.05)
+    assert json.loads(path.read_text()) == {}
+
+
+async def test_caching_fadeable(tmp_path):
+    store = SettingsStore(tmp_path / "settings.json")
+    f = CachingMockFadeable(name="fade", store=store, max_duty=100)
+    f.set_max_duty(80)
+    f.set_min_duty(10)
+    g = CachingMockFadeable(name="fade", store=store, max_duty=100)
+    assert g.max_duty == 80
+    assert g.min_duty == 10
+
+
+def test_caching_fadeable_migrate(tmp_path):
+    (tmp_path / "fade.json").write_text(json.dumps({"max_duty": 50}))
+    f = CachingMockFadeable(name="fade", cache_dir=tmp_path, max_duty=100)
+    assert f.max_duty == 50
+    assert not (tmp_path / "fade.json").exists()
+    assert (
+        json.loads((tmp_path / "settings.json").read_text())["fade"]["max_duty"] == 50
+    )
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from rpi_clock.fadeable import MockFadeable
+from rpi_clock.timeline import Timeline, Track
+
+
+async def mock_fadeable(duty=0, **kwargs):
+    f = MockFadeable(**kwargs)
+    await f.set_duty(duty)
+    f.set_duty_mock.reset_mock()
+    return f
+
+
+def duties(f):
+    return [x.args[0] for x in f.set_duty_mock.call_args_list]
+
+
+async def test_timeline():
+    a = await mock_fadeable(max_fade_freq_hz=100)
+    b = await mock_fadeable(100, max_fade_freq_hz=100)
+    start = asyncio.get_running_loop().time()
+    overrun = await Timeline(
+        Track(a, duty=100, duration=0.1),
+        Track(b, percent_duty=0, duration=0.05, offset=0.05),
+    ).run()
+    assert asyncio.get_running_loop().time() - start == pytest.approx(0.1, abs=0.03)
+    assert overrun < 0.03
+    assert duties(a) == sorted(duties(a))
+    assert duties(a)[-1] == 100
+    assert duties(b) == sorted(duties(b), reverse=True)
+    assert duties(b)[-1] == 0
+
+
+async def test_offset():
+    a = await mock_fadeable()
+    timeline = Timeline(Track(a, duty=100, duration=0.01, offset=0.05))
+    timeline.start()
+    await asyncio.sleep(0.03)
+    a.set_duty_mock.assert_not_called()
+    await asyncio.sleep(0.05)
+    assert not timeline.running
+    a.set_duty_mock.assert_called_with(100)
+
+
+async def test_slow_track_skips_frames():
+    async def slow_write(_):
+        await asyncio.sleep(0.03)
+
+    fast = await mock_fadeable(max_fade_freq_hz=100)
+    slow = await mock_fadeable(max_fade_freq_hz=100)
+    slow.set_duty_mock.side_effect = slow_write
+    await Timeline(
+        Track(fast, duty=100, duration=0.2), Track(slow, duty=100, duration=0.2)
+    ).run()
+    assert slow.set_duty_mock.call_count < fast.set_duty_mock.call_count / 2
+    slow.set_duty_mock.assert_called_with(100)
+
+
+async def test_cancel():
+    a = await mock_fadeable()
+    b = await mock_fadeable()
+    timeline = Timeline(
+        Track(a, duty=100, duration=1), Track(b, duty=100, duration=1, offset=0.5)
+    )
+    timeline.start()
+    await asyncio.sleep(0.1)
+    timeline.cancel()
+    await asyncio.sleep(0.01)
+    assert not timeline.running
+    count = a.set_duty_mock.call_count
+    await asyncio.sleep(0.5)
+    assert a.set_duty_mock.call_count == count
+    b.set_duty_mock.assert_not_called()
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        Timeline()
+    with pytest.raises(ValueError):
+        Track(MockFadeable())
+
+
+async def test_fade_history():
+    a = await mock_fadeable(max_fade_freq_hz=100)
+    b = await mock_fadeable(max_fade_freq_hz=100)
+    timeline = Timeline(
+        Track(a, duty=100, duration=0.05), Track(b, duty=100, duration=1)
+    )
+    timeline.start()
+    await asyncio.sleep(0.1)
+    timeline.cancel()
+    await asyncio.sleep(0)
+    stats = a.fade_history[-1]
+    assert stats.duty == 100
+    assert not stats.cancelled
+    assert 3 < stats.steps <= 7
+    assert stats.interval_p50_s == pytest.approx(0.01, abs=0.005)
+    assert b.fade_history[-1].cancelled
+
+
+async def test_run_twice():
+    a = await mock_fadeable()
+    timeline = Timeline(Track(a, duty=100, duration=0.01))
+    await timeline.run()
+    await a.set_duty(0)
+    await timeline.run()
+    assert duties(a)[-1] == 100
+    assert [x.cancelled for x in a.fade_history] == [False, False]
+
+
+async def test_fade_supersedes_track():
+    a = await mock_fadeable(max_fade_freq_hz=100)
+    b = await mock_fadeable(max_fade_freq_hz=100)
+    timeline = Timeline(
+        Track(a, duty=100, duration=1), Track(b, duty=100, duration=0.1)
+    )
+    timeline.start()
+    await asyncio.sleep(0.05)
+    assert a.plan
+    await a.fade(duty=0, duration=0.01)
+    await asyncio.sleep(0.1)
+    assert not timeline.running
+    assert duties(a)[-1] == 0
+    assert duties(b)[-1] == 100
+    assert {(x.duty, x.cancelled) for x in a.fade_history} == {(100, True), (0, False)}
+    assert not a.plan
+
+
+async def test_retarget_track():
+    a = await mock_fadeable(max_fade_freq_hz=100)
+    timeline = Timeline(Track(a, duty=100, duration=0.1))
+    timeline.start()
+    await asyncio.sleep(0.05)
+    overrun = await a.retarget(duty=50)
+    assert overrun < 0.03
+    assert not timeline.running
+    assert duties(a)[-1] == 50
+    assert a.fade_history[-1].duty == 50
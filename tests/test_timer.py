@@ -71,3 +71,39 @@ async def test_cancel_coro():
     t.cancel()
     assert started
     assert not ended
+
+
+async def test_retrigger_extends(mocker):
+    fn = mocker.MagicMock()
+    t = Timer(duration_ms=10, fn=fn)
+    t.trigger()
+    handle = t._handle
+    await asyncio.sleep(0.005)
+    t.trigger()
+    # Moving the deadline later reuses the armed handle.
+    assert t._handle is handle
+    await asyncio.sleep(0.008)
+    fn.assert_not_called()
+    assert t.running
+    await asyncio.sleep(0.005)
+    fn.assert_called_once()
+    assert not t.running
+
+
+async def test_retrigger_shorter(mocker):
+    fn = mocker.MagicMock()
+    t = Timer(duration_ms=50, fn=fn)
+    t.trigger()
+    t.duration = 5
+    t.trigger()
+    await asyncio.sleep(0.01)
+    fn.assert_called_once()
+
+
+async def test_no_task(mocker):
+    create_task = mocker.spy(asyncio, "create_task")
+    t = Timer(duration_ms=1, fn=mocker.MagicMock())
+    for _ in range(10):
+        t.trigger()
+    await asyncio.sleep(0.005)
+    create_task.assert_not_called()